@@ -0,0 +1,64 @@
+from typing import Any, Dict, Iterable, Optional
+import json
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+def dumps(content: Any) -> bytes:
+    """Encode JSON with orjson when it is installed, else the standard library"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        except orjson.JSONEncodeError:
+            pass  # e.g. integers beyond 64 bits, which the standard library encodes
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(Response):
+    """JSON response for data the server produced itself.
+
+    Returning it from a route skips response_model validation and
+    jsonable_encoder, which dominate the cost of multi-megabyte states.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str]) -> Optional[Dict[str, Optional[set]]]:
+    """Parse a fields= projection like "status,current_state.quality_score".
+
+    Returns None when every field is wanted, else a map of top-level field to
+    the keys selected inside it (None for the whole field).
+    """
+    if not fields:
+        return None
+    allowed = set(allowed)
+    selected: Dict[str, Optional[set]] = {}
+    for name in filter(None, (part.strip() for part in fields.split(","))):
+        top, _, key = name.partition(".")
+        if top not in allowed:
+            raise HTTPException(status_code=400, detail=f"Unknown field '{top}'")
+        if not key:
+            selected[top] = None
+        elif top in selected and selected[top] is None:
+            continue
+        else:
+            selected.setdefault(top, set()).add(key)
+    return selected
+
+def project(payload: Dict[str, Any], selected: Optional[Dict[str, Optional[set]]]) -> Dict[str, Any]:
+    """Keep only the selected fields, and the selected keys of dict fields"""
+    if selected is None:
+        return payload
+    projected = {}
+    for top, keys in selected.items():
+        value = payload[top]
+        if keys is not None and isinstance(value, dict):
+            value = {key: value[key] for key in keys if key in value}
+        projected[top] = value
+    return projected
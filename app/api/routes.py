@@ -1,51 +1,267 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from typing import Dict
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+import asyncio
+import base64
+import json
 import uuid
 import logging
 from app.models.schemas import (
     CreateGraphRequest, CreateGraphResponse,
-    RunGraphRequest, RunGraphResponse,
-    ExecutionStateResponse
+    RunGraphRequest, RunGraphResponse, RunBatchRequest, RunBatchResponse,
+    ExecutionStateResponse, ExecutionProfileResponse, ExecutionListResponse, GraphDefinition,
+    StepStateResponse, UploadResponse
 )
-from app.core.engine import WorkflowEngine
+from app.config import settings
+from app.core.engine import WorkflowEngine, ExecutionDeadlineError
+from app.core.engine_cache import engine_cache
+from app.core.tool_cache import tool_cache
+from app.core.state import reconstruct_state, merge_log_deltas
+from app.core.events import event_bus, current_execution_id
+from app.core.scheduler import scheduler, QueueFullError
+from app.core.execution_store import execution_store, ACTIVE_STATUSES
+from app.core.uploads import upload_store, UploadTooLargeError
+from app.core.profiling import ExecutionProfiler
+from app.core.blobs import blob_store
+from app.api.responses import FastJSONResponse, parse_fields, project
+from app.core import metrics
 from app.database import db
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-active_executions: Dict[str, dict] = {}
-
 async def execute_workflow_background(execution_id: str, graph_id: str, 
-                                     engine: WorkflowEngine, initial_state: dict):
-    """Background task to execute workflow"""
+                                     engine: WorkflowEngine, initial_state: dict,
+                                     start_node: Optional[str] = None,
+                                     execution_log: Optional[list] = None,
+                                     profile: bool = False):
+    """Background task to execute workflow, checkpointing after every node"""
+    queue_wait_ms = scheduler.running.get(execution_id, 0.0) * 1000
+    record = {
+        "graph_id": graph_id,
+        "status": "running",
+        "state": initial_state,
+        "log": execution_log if execution_log is not None else [],
+        "queue_wait_ms": queue_wait_ms
+    }
+    execution_store.put(execution_id, record)
+    resume_at = start_node or engine.start_node
+    published = len(record["log"])
+    # Entries of a resumed log are already stored; checkpoints append the rest
+    persisted = len(record["log"])
+    log_size = 0
+    
+    def publish(final: bool = False):
+        """Push log entries added since the last event to WebSocket subscribers"""
+        nonlocal published
+        log = record["log"]
+        if event_bus.has_subscribers(execution_id):
+            entries = log[published:]
+            payload = {
+                "execution_id": execution_id,
+                "status": record["status"],
+                "logs": entries,
+                "state_delta": merge_log_deltas(entries)
+            }
+            if "error" in record:
+                payload["error"] = record["error"]
+            event_bus.publish(execution_id, payload, published, len(entries), final)
+        published = len(log)
+    
+    async def save(status, state, log, next_node) -> int:
+        """Store the state and the log entries added since the last save"""
+        nonlocal persisted, log_size
+        state_size, appended_size = await db.checkpoint_execution(
+            execution_id, graph_id, status, state, log, persisted, next_node
+        )
+        persisted = len(log)
+        log_size += appended_size
+        return state_size + log_size
+    
+    async def checkpoint(state, log, next_node):
+        nonlocal resume_at
+        resume_at = next_node
+        record.update(state=state.data, log=log)
+        publish()
+        await save("running", state.data, log, next_node)
+    
+    publish()
+    
+    profiler = ExecutionProfiler(settings.PROFILE_TOP_N) if profile else None
+    context_token = current_execution_id.set(execution_id)
     try:
-        active_executions[execution_id] = {
-            "status": "running",
-            "state": initial_state,
-            "log": []
-        }
-        
-        final_state, execution_log = await engine.execute(initial_state)
-        
-        active_executions[execution_id] = {
-            "status": "completed",
-            "state": final_state.data,
-            "log": execution_log
-        }
-        
-        await db.save_execution(
-            execution_id, graph_id, "completed",
-            final_state.data, execution_log
+        run = engine.execute(
+            initial_state, on_step=checkpoint,
+            start_node=start_node, execution_log=record["log"]
         )
-        
+        final_state, execution_log = await (profiler.run(run) if profiler else run)
+        record.update(status="completed", state=final_state.data, log=execution_log)
+        resume_at = None
+    except ExecutionDeadlineError as e:
+        logger.warning(f"Execution {execution_id} stopped: {e}")
+        record.update(status="timed_out", error=str(e), state=e.state.data, log=e.execution_log)
+    except asyncio.CancelledError:
+        if not scheduler.cancel_requested(execution_id):
+            raise  # shutting down: the run stays 'running' and resumes on the next start
+        logger.info(f"Execution {execution_id} cancelled at node '{resume_at}'")
+        record.update(status="cancelled")
     except Exception as e:
         logger.error(f"Workflow execution failed: {e}")
-        active_executions[execution_id] = {
-            "status": "failed",
-            "state": initial_state,
-            "log": [],
-            "error": str(e)
-        }
+        record.update(status="failed", error=str(e))
+    finally:
+        current_execution_id.reset(context_token)
+    
+    async def finish():
+        """Persist the final status and hand the record back to the store"""
+        if profiler is not None:
+            try:
+                await db.save_profile(execution_id, profiler.report())
+            except Exception as e:
+                logger.error(f"Failed to persist profile of execution {execution_id}: {e}")
+        
+        try:
+            size = await save(record["status"], record["state"], record["log"], resume_at)
+        except Exception as e:
+            logger.error(f"Failed to persist execution {execution_id}: {e}")
+            size = 0
+        execution_store.put(execution_id, record, size)
+        metrics.executions_finished.inc(status=record["status"])
+        publish(final=True)
+    
+    finishing = asyncio.ensure_future(finish())
+    try:
+        await asyncio.shield(finishing)
+    except asyncio.CancelledError:
+        # The run is over: a cancel landing now waits for its final status to be stored
+        await finishing
+        if not scheduler.cancel_requested(execution_id):
+            raise
+    if record["status"] == "cancelled":
+        raise asyncio.CancelledError()
+
+async def execute_batch_background(batch_id: str, execution_ids: list, graph_id: str,
+                                   engine: WorkflowEngine, initial_states: list):
+    """Background task to execute a batch of runs in lockstep and persist them in one write.
+    
+    Batch runs are not checkpointed per node; if the process stops mid-batch the
+    runs are still persisted as queued and restart individually from the start.
+    """
+    records = []
+    for execution_id, initial_state in zip(execution_ids, initial_states):
+        record = {"graph_id": graph_id, "status": "running", "state": initial_state, "log": [],
+                  "batch_id": batch_id}
+        execution_store.put(execution_id, record)
+        records.append(record)
+    
+    try:
+        results = await engine.execute_batch(initial_states)
+        for record, (final_state, execution_log) in zip(records, results):
+            record.update(status="completed", state=final_state.data, log=execution_log)
+    except Exception as e:
+        logger.error(f"Batch execution failed: {e}")
+        for record in records:
+            record.update(status="failed", error=str(e))
+    
+    try:
+        sizes = await db.save_executions([
+            (execution_id, graph_id, record["status"], record["state"], record["log"],
+             None if record["status"] == "completed" else engine.start_node)
+            for execution_id, record in zip(execution_ids, records)
+        ])
+    except Exception as e:
+        logger.error(f"Failed to persist batch of {len(records)} executions: {e}")
+        sizes = [0] * len(records)
+    
+    for execution_id, record, size in zip(execution_ids, records, sizes):
+        execution_store.put(execution_id, record, size)
+        metrics.executions_finished.inc(status=record["status"])
+        if event_bus.has_subscribers(execution_id):
+            payload = {
+                "execution_id": execution_id,
+                "status": record["status"],
+                "logs": record["log"],
+                "state_delta": merge_log_deltas(record["log"])
+            }
+            if "error" in record:
+                payload["error"] = record["error"]
+            event_bus.publish(execution_id, payload, 0, len(record["log"]), final=True)
+
+async def resume_from_checkpoint(execution_id: str, exec_data: dict, priority: int = 0) -> int:
+    """Queue a persisted execution to continue from its last completed node"""
+    graph_id = exec_data["graph_id"]
+    next_node = exec_data.get("next_node")
+    
+    if next_node is None:
+        # Interrupted after the final checkpoint: nothing is left to run
+        await db.save_execution(execution_id, graph_id, "completed",
+                                exec_data["state"], exec_data["log"])
+        execution_store.pop(execution_id)
+        return 0
+    
+    engine = await get_engine(graph_id)
+    position = scheduler.submit(
+        execution_id,
+        lambda: execute_workflow_background(
+            execution_id, graph_id, engine, exec_data["state"],
+            start_node=next_node, execution_log=exec_data["log"]
+        ),
+        priority=priority
+    )
+    execution_store.put(execution_id, {
+        "graph_id": graph_id,
+        "status": "queued",
+        "state": exec_data["state"],
+        "log": exec_data["log"]
+    })
+    logger.info(f"Resuming execution {execution_id} at node '{next_node}'")
+    return position
+
+async def resume_interrupted_executions():
+    """Requeue executions a previous process left queued or running"""
+    for execution_id in await db.get_interrupted_executions():
+        exec_data = await db.get_execution(execution_id)
+        try:
+            await resume_from_checkpoint(execution_id, exec_data)
+        except QueueFullError:
+            logger.warning("Execution queue full, remaining interrupted executions resume on next start")
+            break
+        except HTTPException as e:
+            logger.error(f"Could not resume execution {execution_id}: {e.detail}")
+        except Exception as e:
+            logger.error(f"Could not resume execution {execution_id}: {e}")
+
+async def load_execution(execution_id: str) -> Optional[dict]:
+    """Return an execution record from memory, falling back to the database"""
+    record = execution_store.get(execution_id)
+    if record is not None:
+        return record
+    
+    exec_data = await db.get_execution(execution_id)
+    if exec_data is None:
+        return None
+    
+    size = exec_data.pop("size", 0)
+    if exec_data["status"] not in ACTIVE_STATUSES:
+        # Active records are pinned only by the scheduler jobs that run them; a row
+        # still queued or running in the database may have nothing running it
+        execution_store.put(execution_id, exec_data, size)
+    return exec_data
+
+async def get_engine(graph_id: str) -> WorkflowEngine:
+    """Return the compiled engine for a graph, building it from the DB on a cache miss"""
+    engine = engine_cache.get(graph_id)
+    if engine is not None:
+        return engine
+    
+    graph_def = await db.get_graph(graph_id)
+    if not graph_def:
+        raise HTTPException(status_code=404, detail="Graph not found")
+    
+    engine = WorkflowEngine(GraphDefinition(**graph_def))
+    engine.graph_id = graph_id
+    engine_cache.put(graph_id, engine)
+    return engine
 
 @router.post("/graph/create", response_model=CreateGraphResponse)
 async def create_graph(request: CreateGraphRequest):
@@ -53,67 +269,388 @@ async def create_graph(request: CreateGraphRequest):
     try:
         engine = WorkflowEngine(request.definition)
         await db.save_graph(engine.graph_id, engine.name, request.definition.dict())
+        engine_cache.put(engine.graph_id, engine)
         
         return CreateGraphResponse(
             graph_id=engine.graph_id,
-            message=f"Graph '{engine.name}' created successfully"
+            message=f"Graph '{engine.name}' created successfully",
+            warnings=engine.warnings
         )
     except Exception as e:
         logger.error(f"Error creating graph: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.put("/graph/{graph_id}", response_model=CreateGraphResponse)
+async def replace_graph(graph_id: str, request: CreateGraphRequest):
+    """Replace the definition of an existing workflow graph"""
+    if not await db.get_graph(graph_id):
+        raise HTTPException(status_code=404, detail="Graph not found")
+    
+    try:
+        engine = WorkflowEngine(request.definition)
+    except Exception as e:
+        logger.error(f"Error replacing graph: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    engine.graph_id = graph_id
+    engine_cache.invalidate(graph_id)
+    await db.save_graph(graph_id, engine.name, request.definition.dict())
+    engine_cache.put(graph_id, engine)
+    
+    return CreateGraphResponse(
+        graph_id=graph_id,
+        message=f"Graph '{engine.name}' replaced successfully",
+        warnings=engine.warnings
+    )
+
+@router.get("/graph/scheduler")
+async def get_scheduler_stats():
+    """Queue depth, running executions and average queue wait"""
+    return scheduler.stats()
+
+@router.get("/graph/store")
+async def get_execution_store_stats():
+    """Size, hit/miss and eviction counters for the in-memory execution store"""
+    return execution_store.stats()
+
+@router.get("/graph/cache")
+async def get_engine_cache_stats():
+    """Hit/miss counters for the compiled engine cache"""
+    return engine_cache.stats()
+
+@router.get("/graph/events")
+async def get_event_bus_stats():
+    """Executions with WebSocket subscribers and the number of subscribers"""
+    return event_bus.stats()
+
+@router.get("/graph/blobs")
+async def get_blob_store_stats():
+    """Hit/miss counters for the in-memory cache of blob values"""
+    return blob_store.stats()
+
+@router.get("/graph/blobs/{digest}", response_class=PlainTextResponse)
+async def get_blob(digest: str):
+    """The value behind a {"$blob": digest} reference in an execution's state"""
+    try:
+        return PlainTextResponse(await blob_store.get(digest))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/graph/tool_cache")
+async def get_tool_cache_stats():
+    """Hit/miss counters for memoized tool results"""
+    return tool_cache.stats()
+
+@router.post("/graph/upload", response_model=UploadResponse)
+async def upload_code(request: Request):
+    """Stream a request body to disk; pass the returned upload_id in initial_state instead of code"""
+    try:
+        upload_id, size = await upload_store.save(request.stream())
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    return UploadResponse(
+        upload_id=upload_id,
+        size=size,
+        message=f"Uploaded {size} bytes"
+    )
+
 @router.post("/graph/run", response_model=RunGraphResponse)
-async def run_graph(request: RunGraphRequest, background_tasks: BackgroundTasks):
-    """Execute a workflow graph"""
+async def run_graph(request: RunGraphRequest):
+    """Queue a workflow graph for execution"""
     try:
-        graph_def = await db.get_graph(request.graph_id)
-        if not graph_def:
-            raise HTTPException(status_code=404, detail="Graph not found")
-        
-        from app.models.schemas import GraphDefinition
-        engine = WorkflowEngine(GraphDefinition(**graph_def))
+        engine = await get_engine(request.graph_id)
+        initial_state = await blob_store.externalize(request.initial_state)
         
         execution_id = str(uuid.uuid4())
         
-        background_tasks.add_task(
-            execute_workflow_background,
-            execution_id, request.graph_id, engine, request.initial_state
+        # The queued row is written before the job can run, so the job's own
+        # checkpoints always land after it and a crash leaves a row to resume
+        scheduler.check_capacity()
+        await db.save_execution(
+            execution_id, request.graph_id, "queued",
+            initial_state, [], engine.start_node
         )
+        try:
+            position = scheduler.submit(
+                execution_id,
+                lambda: execute_workflow_background(
+                    execution_id, request.graph_id, engine, initial_state,
+                    profile=request.profile
+                ),
+                priority=request.priority
+            )
+        except QueueFullError:
+            await db.delete_executions([execution_id])
+            raise
+        execution_store.put(execution_id, {
+            "graph_id": request.graph_id,
+            "status": "queued",
+            "state": initial_state,
+            "log": []
+        })
         
+        started = position == 0 and len(scheduler.running) < scheduler.max_workers
         return RunGraphResponse(
             execution_id=execution_id,
-            status="started",
-            message="Workflow execution started"
+            status="started" if started else "queued",
+            message="Workflow execution started" if started else f"Workflow execution queued at position {position}"
+        )
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429, detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error running graph: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/graph/state/{execution_id}", response_model=ExecutionStateResponse)
-async def get_execution_state(execution_id: str):
-    """Get the current state of a workflow execution"""
-    if execution_id in active_executions:
-        exec_data = active_executions[execution_id]
-        return ExecutionStateResponse(
-            execution_id=execution_id,
-            graph_id="",
-            status=exec_data["status"],
-            current_state=exec_data["state"],
-            execution_log=exec_data["log"]
+@router.post("/graph/run_batch", response_model=RunBatchResponse)
+async def run_graph_batch(request: RunBatchRequest):
+    """Queue many initial states to run together through one graph"""
+    try:
+        engine = await get_engine(request.graph_id)
+        initial_states = [await blob_store.externalize(state) for state in request.initial_states]
+        
+        batch_id = str(uuid.uuid4())
+        execution_ids = [str(uuid.uuid4()) for _ in initial_states]
+        
+        scheduler.check_capacity()
+        await db.save_executions([
+            (execution_id, request.graph_id, "queued", initial_state, [], engine.start_node)
+            for execution_id, initial_state in zip(execution_ids, initial_states)
+        ])
+        try:
+            position = scheduler.submit(
+                batch_id,
+                lambda: execute_batch_background(
+                    batch_id, execution_ids, request.graph_id, engine, initial_states
+                ),
+                priority=request.priority
+            )
+        except QueueFullError:
+            await db.delete_executions(execution_ids)
+            raise
+        for execution_id, initial_state in zip(execution_ids, initial_states):
+            execution_store.put(execution_id, {
+                "graph_id": request.graph_id,
+                "status": "queued",
+                "state": initial_state,
+                "log": [],
+                "batch_id": batch_id
+            })
+        
+        started = position == 0 and len(scheduler.running) < scheduler.max_workers
+        return RunBatchResponse(
+            batch_id=batch_id,
+            execution_ids=execution_ids,
+            status="started" if started else "queued",
+            message=f"Batch of {len(execution_ids)} executions " + (
+                "started" if started else f"queued at position {position}"
+            )
+        )
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429, detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
         )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error running graph batch: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/graph/resume/{execution_id}", response_model=RunGraphResponse)
+async def resume_execution(execution_id: str, priority: int = 0):
+    """Continue a failed or interrupted execution from its last checkpoint"""
+    record = execution_store.get(execution_id)
+    if record is not None and record["status"] in ACTIVE_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Execution is already {record['status']}")
     
     exec_data = await db.get_execution(execution_id)
     if not exec_data:
         raise HTTPException(status_code=404, detail="Execution not found")
+    if exec_data["status"] == "completed":
+        raise HTTPException(status_code=409, detail="Execution already completed")
+    
+    try:
+        position = await resume_from_checkpoint(execution_id, exec_data, priority)
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429, detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     
-    return ExecutionStateResponse(
+    return RunGraphResponse(
         execution_id=execution_id,
-        graph_id=exec_data["graph_id"],
-        status=exec_data["status"],
-        current_state=exec_data["state"],
-        execution_log=exec_data["log"]
+        status="queued" if exec_data.get("next_node") else "completed",
+        message=f"Execution resumed at node '{exec_data['next_node']}'"
+        if exec_data.get("next_node") else "Execution had already finished its last node"
     )
 
+@router.post("/graph/cancel/{execution_id}", response_model=ExecutionStateResponse)
+async def cancel_execution(execution_id: str):
+    """Stop a queued or running execution, free its slot and keep its partial state"""
+    exec_data = await load_execution(execution_id)
+    if not exec_data:
+        raise HTTPException(status_code=404, detail="Execution not found")
+    if exec_data["status"] not in ACTIVE_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Execution is already {exec_data['status']}")
+    
+    cancelled = await scheduler.cancel(execution_id)
+    if cancelled is None and "batch_id" in exec_data:
+        raise HTTPException(status_code=409, detail="Execution runs as part of a batch and cannot be cancelled on its own")
+    
+    if cancelled != "running":
+        # Queued, or left queued or running by an earlier process with nothing running it
+        persisted = await db.get_execution(execution_id)
+        record = {**exec_data, "status": "cancelled"}
+        size = await db.save_execution(
+            execution_id, record["graph_id"], "cancelled", record["state"], record["log"],
+            persisted["next_node"] if persisted else None
+        )
+        execution_store.put(execution_id, record, size)
+        metrics.executions_finished.inc(status="cancelled")
+        if event_bus.has_subscribers(execution_id):
+            event_bus.publish(execution_id, {
+                "execution_id": execution_id,
+                "status": "cancelled",
+                "logs": [],
+                "state_delta": {}
+            }, len(record["log"]), 0, final=True)
+    
+    return await get_execution_state(execution_id, after_step=None, limit=None, include_log=True,
+                                     fields=None, resolve_blobs=False)
+
+def _encode_cursor(key: Tuple[str, int]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def _decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        created_at, rowid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_at), int(rowid)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _db_timestamp(value: Optional[datetime]) -> Optional[str]:
+    """Format a filter bound like SQLite's CURRENT_TIMESTAMP (UTC) so they compare as text"""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+@router.get("/graph/executions", response_model=ExecutionListResponse)
+async def list_executions(graph_id: Optional[str] = None, status: Optional[str] = None,
+                          created_after: Optional[datetime] = None,
+                          created_before: Optional[datetime] = None,
+                          cursor: Optional[str] = None,
+                          limit: int = Query(50, ge=1, le=500)):
+    """List execution summaries newest first; pass next_cursor back as cursor for the next page"""
+    executions, next_key = await db.list_executions(
+        graph_id=graph_id, status=status,
+        created_after=_db_timestamp(created_after),
+        created_before=_db_timestamp(created_before),
+        after=_decode_cursor(cursor) if cursor else None,
+        limit=limit
+    )
+    return ExecutionListResponse(
+        executions=executions,
+        next_cursor=_encode_cursor(next_key) if next_key else None
+    )
+
+@router.get("/graph/state/{execution_id}", response_model=ExecutionStateResponse)
+async def get_execution_state(execution_id: str,
+                              after_step: Optional[int] = Query(None, ge=-1),
+                              limit: Optional[int] = Query(None, ge=0),
+                              include_log: bool = True,
+                              fields: Optional[str] = None,
+                              resolve_blobs: bool = False):
+    """Get the current state of a workflow execution.
+    
+    after_step and limit page through the log: at most limit entries that come
+    after step index after_step. include_log=false returns only the latest state.
+    Paged reads of finished executions fetch just the requested steps.
+    fields selects top-level fields or keys of current_state, e.g.
+    fields=status,current_state.quality_score. Large values appear in
+    current_state as {"$blob": digest, "size": n} unless resolve_blobs is set.
+    """
+    selected = parse_fields(fields, ExecutionStateResponse.model_fields)
+    include_log = include_log and (selected is None or "execution_log" in selected)
+    first_step = after_step + 1 if after_step is not None else 0
+    end = first_step + limit if limit is not None else None
+    paged = after_step is not None or limit is not None or not include_log
+    
+    exec_data = execution_store.get(execution_id)
+    if exec_data is None and paged:
+        exec_data = await db.get_execution(execution_id, include_log=False)
+        if not exec_data:
+            raise HTTPException(status_code=404, detail="Execution not found")
+        step_count = exec_data["step_count"]
+        log = await db.get_steps(execution_id, first_step, limit) if include_log else []
+    else:
+        exec_data = exec_data or await load_execution(execution_id)
+        if not exec_data:
+            raise HTTPException(status_code=404, detail="Execution not found")
+        step_count = len(exec_data["log"])
+        log = exec_data["log"][first_step:end] if include_log else []
+    
+    # The payload is built from data the engine produced, so it goes straight
+    # to the encoder instead of through ExecutionStateResponse validation
+    state = exec_data["state"]
+    if resolve_blobs:
+        state = await blob_store.resolve(state)
+    queued_for = scheduler.queued_for(execution_id)
+    return FastJSONResponse(project({
+        "execution_id": execution_id,
+        "graph_id": exec_data.get("graph_id", ""),
+        "status": exec_data["status"],
+        "current_state": state,
+        "execution_log": log,
+        "first_step": first_step,
+        "step_count": step_count,
+        "queue_position": scheduler.queue_position(execution_id),
+        "queue_depth": scheduler.queue_depth(),
+        "queue_wait_ms": queued_for * 1000 if queued_for is not None else exec_data.get("queue_wait_ms")
+    }, selected))
+
+@router.get("/graph/profile/{execution_id}", response_model=ExecutionProfileResponse)
+async def get_execution_profile(execution_id: str):
+    """Top functions and allocation sites of an execution run with profile enabled"""
+    profile = await db.get_profile(execution_id)
+    if profile is None:
+        exec_data = await load_execution(execution_id)
+        if not exec_data:
+            raise HTTPException(status_code=404, detail="Execution not found")
+        if exec_data["status"] in ACTIVE_STATUSES:
+            raise HTTPException(status_code=409, detail=f"Execution is still {exec_data['status']}")
+        raise HTTPException(status_code=404, detail="Execution was not profiled")
+    
+    return ExecutionProfileResponse(execution_id=execution_id, **profile)
+
+@router.get("/graph/state/{execution_id}/steps/{step}", response_model=StepStateResponse)
+async def get_step_state(execution_id: str, step: int, fields: Optional[str] = None):
+    """Reconstruct the full state after a given step of the execution log"""
+    selected = parse_fields(fields, StepStateResponse.model_fields)
+    exec_data = await load_execution(execution_id)
+    if not exec_data:
+        raise HTTPException(status_code=404, detail="Execution not found")
+    log = exec_data["log"]
+    
+    try:
+        state = reconstruct_state(log, step)
+    except IndexError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    return FastJSONResponse(project({
+        "execution_id": execution_id,
+        "step": step,
+        "node": log[step]["node"],
+        "state": state
+    }, selected))
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -1,37 +1,68 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-import asyncio
 import logging
+from app.core.events import event_bus, RESYNC
 
 logger = logging.getLogger(__name__)
 ws_router = APIRouter()
 
+FINISHED_STATUSES = ("completed", "failed", "timed_out", "cancelled")
+
 @ws_router.websocket("/ws/execution/{execution_id}")
 async def websocket_execution_stream(websocket: WebSocket, execution_id: str):
     await websocket.accept()
-    
+
+    # Subscribe before loading the snapshot so no step can fall in between
+    queue = event_bus.subscribe(execution_id)
     try:
-        from app.api.routes import active_executions
-        
+        from app.api.routes import load_execution
+
+        sent_steps = await send_snapshot(websocket, execution_id, load_execution)
+        if sent_steps is None:
+            return
+
         while True:
-            if execution_id in active_executions:
-                exec_data = active_executions[execution_id]
-                
-                # Send full logs along with status and current state
-                await websocket.send_json({
-                    "execution_id": execution_id,
-                    "status": exec_data["status"],
-                    "current_state": exec_data["state"],
-                    "logs": exec_data["log"]
-                })
-                
-                # Stop streaming if workflow is completed or failed
-                if exec_data["status"] in ["completed", "failed"]:
-                    break
-            
-            await asyncio.sleep(0.5)
-        
+            event = await queue.get()
+
+            if event is RESYNC:
+                sent_steps = await send_snapshot(websocket, execution_id, load_execution)
+                if sent_steps is None:
+                    return
+                continue
+
+            # Skip steps the snapshot already contained
+            if event.final or event.step_count == 0 or event.first_step + event.step_count > sent_steps:
+                await websocket.send_text(event.message)
+                sent_steps = max(sent_steps, event.first_step + event.step_count)
+
+            # Stop streaming if workflow is completed or failed
+            if event.final:
+                await websocket.close()
+                break
+
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected for execution {execution_id}")
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
         await websocket.close()
+    finally:
+        event_bus.unsubscribe(execution_id, queue)
+
+async def send_snapshot(websocket: WebSocket, execution_id: str, load_execution):
+    """Send the full state and log once; return the number of steps sent, or None when done"""
+    exec_data = await load_execution(execution_id)
+    if exec_data is None:
+        await websocket.send_json({"execution_id": execution_id, "error": "Execution not found"})
+        await websocket.close()
+        return None
+
+    await websocket.send_json({
+        "execution_id": execution_id,
+        "status": exec_data["status"],
+        "current_state": exec_data["state"],
+        "logs": exec_data["log"]
+    })
+
+    if exec_data["status"] in FINISHED_STATUSES:
+        await websocket.close()
+        return None
+    return len(exec_data["log"])
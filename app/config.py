@@ -1,11 +1,37 @@
-﻿from pydantic_settings import BaseSettings
+﻿from typing import List, Optional
+from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite+aiosqlite:///./workflow_engine.db"
     LOG_LEVEL: str = "INFO"
     MAX_CONCURRENT_EXECUTIONS: int = 10
+    EXECUTION_QUEUE_SIZE: int = 100
+    MAX_BATCH_SIZE: int = 100  # initial states per /graph/run_batch request
+    EXECUTION_STORE_MAX_ENTRIES: int = 1000
+    EXECUTION_STORE_TTL_SECONDS: float = 300
+    EXECUTION_STORE_MAX_BYTES: int = 256 * 1024 * 1024
+    EVENT_QUEUE_SIZE: int = 1000
+    LOG_CHECKPOINT_INTERVAL: int = 10
+    DB_READ_POOL_SIZE: int = 4
+    DB_MAX_BATCH_SIZE: int = 256
+    ENGINE_CACHE_SIZE: int = 256
+    TOOL_THREAD_POOL_SIZE: int = 8
+    TOOL_PROCESS_POOL_SIZE: Optional[int] = None  # defaults to os.cpu_count()
+    TOOL_CACHE_SIZE: int = 1024
+    TOOL_CACHE_PERSIST: bool = False
+    TOOL_CACHE_PERSIST_MAX_ENTRIES: int = 100_000
+    TOOL_CACHE_PERSIST_TTL_SECONDS: float = 7 * 24 * 3600
+    UPLOAD_DIR: str = "./uploads"
+    UPLOAD_MAX_BYTES: int = 1024 * 1024 * 1024
+    CODE_ROOTS: List[str] = []  # directories workflows may read by path
+    PROFILE_TOP_N: int = 30
+    MAP_CONCURRENCY: int = 16  # default for map nodes without map_concurrency
+    BLOB_MIN_SIZE: int = 64 * 1024  # strings this long move to the blob table; 0 keeps them inline
+    BLOB_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    GZIP_MINIMUM_SIZE: int = 1024
+    GZIP_COMPRESS_LEVEL: int = 5
     
     class Config:
         env_file = ".env"
 
-settings = Settings()
+settings = Settings()
@@ -0,0 +1,138 @@
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+import hashlib
+import logging
+from app.config import settings
+from app.database import db
+
+logger = logging.getLogger(__name__)
+
+BLOB_KEY = "$blob"
+
+def blob_ref(digest: str, size: int) -> Dict[str, Any]:
+    """The reference a state holds in place of a value moved to the blob table"""
+    return {BLOB_KEY: digest, "size": size}
+
+def is_blob_ref(value: Any) -> bool:
+    return isinstance(value, dict) and len(value) == 2 and BLOB_KEY in value and "size" in value
+
+class BlobStore:
+    """Content-addressed store for large state values.
+
+    String values at least min_size characters long are replaced in state by a
+    small reference to a row in the blobs table keyed by their SHA-256, so a
+    value shared by many executions is stored once and its snapshots, log
+    entries and execution rows carry only the reference. Tools get the values
+    back just before they run, from an LRU of decoded values bounded by
+    max_bytes that is shared across executions, or from the database.
+    Without a connected database, values stay inline.
+    """
+
+    def __init__(self, min_size: int = 64 * 1024, max_bytes: int = 256 * 1024 * 1024):
+        self.min_size = min_size
+        self.max_bytes = max_bytes
+        self._values: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._digests: Dict[int, str] = {}  # id() of a cached value -> its digest
+        self._stored: set = set()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.min_size > 0 and db.connection is not None
+
+    async def externalize(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace large string values with blob references, storing each distinct value once.
+
+        Returns data itself when nothing needs to move, else a shallow copy.
+        """
+        if not self.enabled:
+            return data
+        large = [key for key, value in data.items()
+                 if isinstance(value, str) and len(value) >= self.min_size]
+        if not large:
+            return data
+        data = dict(data)
+        for key in large:
+            data[key] = await self.put(data[key])
+        return data
+
+    async def put(self, value: str) -> Dict[str, Any]:
+        digest = self._digests.get(id(value))
+        if digest is not None and self._values[digest][0] is value:
+            # A cached value passed through a tool unchanged: no need to hash it again
+            size = self._values[digest][1]
+        else:
+            encoded = value.encode("utf-8")
+            digest = hashlib.sha256(encoded).hexdigest()
+            size = len(encoded)
+        if digest not in self._stored:
+            await db.save_blob(digest, value, size)
+            self._stored.add(digest)
+        self._remember(digest, value, size)
+        return blob_ref(digest, size)
+
+    async def get(self, digest: str) -> str:
+        entry = self._values.get(digest)
+        if entry is not None:
+            self._values.move_to_end(digest)
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        value = await db.get_blob(digest)
+        if value is None:
+            raise ValueError(f"Blob '{digest}' not found")
+        self._stored.add(digest)
+        self._remember(digest, value, len(value.encode("utf-8")))
+        return value
+
+    async def resolve(self, data: Dict[str, Any], keys: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Data with blob references under keys (all keys if None) replaced by their values.
+
+        Returns data itself when it holds no references there, else a shallow copy.
+        """
+        names = data.keys() if keys is None else keys
+        refs = [(key, data[key]) for key in names if is_blob_ref(data.get(key))]
+        if not refs:
+            return data
+        resolved = dict(data)
+        for key, ref in refs:
+            resolved[key] = await self.get(ref[BLOB_KEY])
+        return resolved
+
+    def _remember(self, digest: str, value: str, size: int):
+        if digest in self._values:
+            self._values.move_to_end(digest)
+            return
+        if size > self.max_bytes:
+            return
+        self._values[digest] = (value, size)
+        self._digests[id(value)] = digest
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (evicted, evicted_size) = self._values.popitem(last=False)
+            del self._digests[id(evicted)]
+            self.bytes -= evicted_size
+
+    def clear(self):
+        self._values.clear()
+        self._digests.clear()
+        self._stored.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "min_size": self.min_size,
+            "cached": len(self._values),
+            "cached_bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+blob_store = BlobStore(settings.BLOB_MIN_SIZE, settings.BLOB_CACHE_MAX_BYTES)
@@ -0,0 +1,227 @@
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+import logging
+from app.core.condition import Condition, compile_condition
+from app.core.registry import ToolRegistry, tool_registry
+from app.models.schemas import GraphDefinition, NodeConfig, NodeType
+
+logger = logging.getLogger(__name__)
+
+class GraphCompileError(ValueError):
+    """Raised when a graph definition cannot be compiled; lists every problem found"""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("Invalid graph: " + "; ".join(errors))
+        self.errors = errors
+
+class Successors:
+    """Precomputed outgoing edges of one node, in definition order"""
+
+    __slots__ = ("parallel", "conditional", "default", "names")
+
+    def __init__(self):
+        self.parallel: List[Tuple[Optional[Condition], str]] = []
+        self.conditional: List[Tuple[Condition, str]] = []
+        self.default: Optional[str] = None
+        self.names: FrozenSet[str] = frozenset()  # state keys the edge conditions read
+
+    def parallel_targets(self, data: dict) -> List[str]:
+        """Targets of the fan-out edges whose condition (if any) holds"""
+        return [target for condition, target in self.parallel
+                if condition is None or condition(data)]
+
+    def next_node(self, data: dict) -> Optional[str]:
+        """First conditional edge that holds, else the default edge"""
+        for condition, target in self.conditional:
+            if condition(data):
+                return target
+        return self.default
+
+class CompiledGraph:
+    """A validated graph: reachable nodes, successor tables and the nodes that need cycle guards"""
+
+    def __init__(self, definition: GraphDefinition, nodes: Dict[str, NodeConfig],
+                 successors: Dict[str, Successors], cycle_guarded: Set[str],
+                 pruned: List[str], warnings: List[str]):
+        self.definition = definition
+        self.start_node = definition.start_node
+        self.nodes = nodes
+        self.successors = successors
+        self.cycle_guarded = cycle_guarded
+        self.pruned = pruned
+        self.warnings = warnings
+
+def compile_graph(definition: GraphDefinition,
+                  registry: ToolRegistry = tool_registry) -> CompiledGraph:
+    """Validate a definition and precompute what the engine needs to walk it.
+
+    Rejects duplicate nodes, a missing start node, edges to or from unknown
+    nodes, unregistered tools and invalid conditions. Prunes nodes the start
+    node cannot reach and warns about every cycle through non-loop nodes,
+    which stop a run when it revisits them. The start node is only guarded
+    when it is the sole non-loop node of its cycle, e.g. a self-loop.
+    """
+    errors: List[str] = []
+    warnings: List[str] = []
+
+    nodes: Dict[str, NodeConfig] = {}
+    for node in definition.nodes:
+        if node.name in nodes:
+            errors.append(f"Duplicate node '{node.name}'")
+        nodes[node.name] = node
+        if node.tool is not None and node.tool not in registry.tools:
+            errors.append(f"Node '{node.name}' uses unknown tool '{node.tool}'")
+
+    if definition.start_node not in nodes:
+        errors.append(f"Start node '{definition.start_node}' is not defined")
+
+    conditions: Dict[str, Condition] = {}
+    successors: Dict[str, Successors] = {name: Successors() for name in nodes}
+    for edge in definition.edges:
+        if edge.from_node not in nodes or edge.to_node not in nodes:
+            dangling = edge.from_node if edge.from_node not in nodes else edge.to_node
+            errors.append(f"Edge {edge.from_node} -> {edge.to_node} references unknown node '{dangling}'")
+            continue
+
+        condition = None
+        if edge.condition:
+            condition = conditions.get(edge.condition)
+            if condition is None:
+                try:
+                    condition = conditions[edge.condition] = compile_condition(edge.condition)
+                except ValueError as e:
+                    errors.append(f"Edge {edge.from_node} -> {edge.to_node}: {e}")
+                    continue
+
+        table = successors[edge.from_node]
+        if condition is not None:
+            table.names |= condition.names
+        if edge.parallel:
+            table.parallel.append((condition, edge.to_node))
+        elif condition is not None:
+            table.conditional.append((condition, edge.to_node))
+        elif table.default is None:
+            table.default = edge.to_node
+        else:
+            warnings.append(
+                f"Node '{edge.from_node}' has several unconditional edges; "
+                f"only the one to '{table.default}' is used"
+            )
+
+    if errors:
+        raise GraphCompileError(errors)
+
+    adjacency = {name: _targets(table) for name, table in successors.items()}
+    reachable = _reachable(definition.start_node, adjacency)
+    pruned = [name for name in nodes if name not in reachable]
+    for name in pruned:
+        warnings.append(f"Node '{name}' is unreachable from '{definition.start_node}' and was pruned")
+        del nodes[name]
+        del successors[name]
+        del adjacency[name]
+
+    cycle_guarded: Set[str] = set()
+    for component in _cycles(adjacency):
+        guarded = {name for name in component if nodes[name].type != NodeType.LOOP}
+        if len(guarded) > 1:
+            guarded.discard(definition.start_node)
+        if guarded:
+            cycle_guarded |= guarded
+            warnings.append(
+                f"Nodes {sorted(component)} form a cycle; a run stops when it revisits "
+                f"non-loop node(s) {sorted(guarded)}"
+            )
+
+    for warning in warnings:
+        logger.warning(f"Graph '{definition.name}': {warning}")
+
+    return CompiledGraph(definition, nodes, successors, cycle_guarded, pruned, warnings)
+
+def _targets(table: Successors) -> List[str]:
+    if not table.parallel and not table.conditional:
+        return [table.default] if table.default is not None else []
+    targets = [target for _, target in table.parallel]
+    targets.extend(target for _, target in table.conditional)
+    if table.default is not None:
+        targets.append(table.default)
+    return targets
+
+def _reachable(start: str, adjacency: Dict[str, List[str]]) -> Set[str]:
+    seen = {start}
+    stack = [start]
+    while stack:
+        for target in adjacency[stack.pop()]:
+            if target not in seen:
+                seen.add(target)
+                stack.append(target)
+    return seen
+
+def _cyclic_core(adjacency: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """The subgraph left after repeatedly trimming nodes without predecessors or successors.
+    
+    Every cycle survives the trimming, and for the usual acyclic graph nothing
+    is left, so the component search below rarely has work to do.
+    """
+    core = {name: list(targets) for name, targets in adjacency.items()}
+    for _ in range(2):
+        degree = dict.fromkeys(core, 0)
+        for targets in core.values():
+            for target in targets:
+                degree[target] += 1
+        ready = [name for name, count in degree.items() if count == 0]
+        while ready:
+            name = ready.pop()
+            for target in core.pop(name):
+                degree[target] -= 1
+                if degree[target] == 0:
+                    ready.append(target)
+        # Second pass trims nodes without successors by reversing the edges
+        reverse: Dict[str, List[str]] = {name: [] for name in core}
+        for name, targets in core.items():
+            for target in targets:
+                reverse[target].append(name)
+        core = reverse
+    return core
+
+def _cycles(adjacency: Dict[str, List[str]]) -> List[List[str]]:
+    """Strongly connected components that contain a cycle (Tarjan's algorithm, iterative)"""
+    adjacency = _cyclic_core(adjacency)
+    index: Dict[str, int] = {}
+    lowlink: Dict[str, int] = {}
+    on_stack: Set[str] = set()
+    stack: List[str] = []
+    components: List[List[str]] = []
+
+    for root in adjacency:
+        if root in index:
+            continue
+        work = [(root, iter(adjacency[root]))]
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            name, targets = work[-1]
+            for target in targets:
+                if target not in index:
+                    index[target] = lowlink[target] = len(index)
+                    stack.append(target)
+                    on_stack.add(target)
+                    work.append((target, iter(adjacency[target])))
+                    break
+                if target in on_stack:
+                    lowlink[name] = min(lowlink[name], index[target])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[name])
+                if lowlink[name] == index[name]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == name:
+                            break
+                    if len(component) > 1 or name in adjacency[name]:
+                        components.append(component)
+    return components
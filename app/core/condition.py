@@ -0,0 +1,70 @@
+from typing import Any, Mapping
+from functools import lru_cache
+import ast
+import logging
+
+logger = logging.getLogger(__name__)
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.BinOp, ast.UnaryOp, ast.Compare,
+    ast.Name, ast.Load, ast.Constant, ast.Tuple, ast.List, ast.Set,
+    ast.Subscript, ast.Slice, ast.Attribute, ast.Call, ast.keyword,
+    ast.And, ast.Or, ast.Not, ast.USub, ast.UAdd, ast.Invert,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+    ast.Is, ast.IsNot, ast.In, ast.NotIn,
+)
+
+# Format strings can reach private attributes ("{0.__class__}")
+_DENIED_METHODS = {"format", "format_map"}
+
+_NO_BUILTINS = {"__builtins__": {}}
+
+class Condition:
+    """A condition expression parsed and validated once, evaluated against state data"""
+
+    __slots__ = ("source", "names", "_code")
+
+    def __init__(self, source: str):
+        try:
+            tree = ast.parse(source.strip(), mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"Invalid condition '{source}': {e.msg}")
+
+        for node in ast.walk(tree):
+            if not isinstance(node, _ALLOWED_NODES):
+                raise ValueError(
+                    f"Invalid condition '{source}': {type(node).__name__} is not allowed"
+                )
+            if isinstance(node, ast.Attribute) and node.attr.startswith("_"):
+                raise ValueError(
+                    f"Invalid condition '{source}': private attribute '{node.attr}' is not allowed"
+                )
+            if isinstance(node, ast.Call) and (
+                not isinstance(node.func, ast.Attribute) or node.func.attr in _DENIED_METHODS
+            ):
+                raise ValueError(
+                    f"Invalid condition '{source}': only method calls on state values are allowed"
+                )
+
+        self.source = source
+        self.names = frozenset(
+            node.id for node in ast.walk(tree) if isinstance(node, ast.Name)
+        )
+        self._code = compile(tree, f"<condition: {source}>", "eval")
+
+    def __call__(self, data: Mapping[str, Any]) -> bool:
+        """Evaluate directly against the state mapping, without copying it"""
+        try:
+            return bool(eval(self._code, _NO_BUILTINS, data))
+        except Exception as e:
+            logger.error(f"Error evaluating condition '{self.source}': {e}")
+            return False
+
+    def __repr__(self) -> str:
+        return f"Condition({self.source!r})"
+
+@lru_cache(maxsize=1024)
+def compile_condition(source: str) -> Condition:
+    """Compile a condition string, sharing the result across graphs"""
+    return Condition(source)
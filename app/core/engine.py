@@ -1,106 +1,303 @@
-﻿from typing import Dict, List, Optional
+﻿from typing import Awaitable, Callable, Dict, List, Optional, Set
+import asyncio
+import time
 import uuid
 from datetime import datetime
 import logging
+from app.core import metrics
+from app.core.blobs import blob_store
+from app.core.compiler import compile_graph
 from app.core.node import Node
 from app.core.state import WorkflowState
-from app.models.schemas import GraphDefinition, EdgeConfig
+from app.config import settings
+from app.models.schemas import GraphDefinition
 
 logger = logging.getLogger(__name__)
 
+StepCallback = Callable[[WorkflowState, List[dict], Optional[str]], Awaitable[None]]
+
+class ExecutionDeadlineError(Exception):
+    """Raised when an execution runs past its graph's deadline.
+    
+    Carries the state and log as they were when the run was cancelled.
+    """
+    
+    def __init__(self, deadline: float, state: Optional[WorkflowState] = None,
+                 execution_log: Optional[List[dict]] = None):
+        super().__init__(f"Execution exceeded its deadline of {deadline}s")
+        self.deadline = deadline
+        self.state = state
+        self.execution_log = execution_log
+
 class WorkflowEngine:
     def __init__(self, graph_definition: GraphDefinition):
         self.graph_id = str(uuid.uuid4())
         self.name = graph_definition.name
         self.nodes: Dict[str, Node] = {}
-        self.edges: Dict[str, List[EdgeConfig]] = {}
         self.start_node = graph_definition.start_node
+        self.merge_strategies = dict(graph_definition.merge_strategies)
+        self.deadline = graph_definition.deadline_seconds
         
         self._build_graph(graph_definition)
     
     def _build_graph(self, definition: GraphDefinition):
-        """Build the graph from definition"""
-        for node_config in definition.nodes:
+        """Compile the definition and build nodes for the reachable part of the graph"""
+        plan = compile_graph(definition)
+        self.successors = plan.successors
+        self.cycle_guarded = plan.cycle_guarded
+        self.warnings = plan.warnings
+        
+        for node_config in plan.nodes.values():
             self.nodes[node_config.name] = Node(
                 name=node_config.name,
                 tool_name=node_config.tool,
                 node_type=node_config.type,
                 loop_condition=node_config.loop_condition,
-                max_iterations=node_config.max_iterations or 10
+                max_iterations=node_config.max_iterations or 10,
+                timeout=node_config.timeout_seconds,
+                map_over=node_config.map_over,
+                map_as=node_config.map_as,
+                map_output=node_config.map_output,
+                map_concurrency=node_config.map_concurrency or settings.MAP_CONCURRENCY
             )
-        
-        for edge in definition.edges:
-            if edge.from_node not in self.edges:
-                self.edges[edge.from_node] = []
-            self.edges[edge.from_node].append(edge)
     
-    async def execute(self, initial_state: Dict = None) -> tuple:
-        """Execute the workflow from start to finish"""
+    async def execute(self, initial_state: Dict = None, on_step: Optional[StepCallback] = None,
+                      start_node: Optional[str] = None,
+                      execution_log: Optional[List[dict]] = None) -> tuple:
+        """Execute the workflow from start to finish.
+        
+        on_step is awaited after every main-line node with the state, the log so
+        far and the node that will run next, so callers can checkpoint. Passing a
+        checkpointed state with start_node and execution_log resumes a run.
+        The graph deadline, if any, applies to each call, so a resumed run gets
+        a fresh one.
+        """
         state = WorkflowState(initial_state or {})
-        execution_log = []
+        execution_log = execution_log if execution_log is not None else []
+        visited_nodes = {entry["node"] for entry in execution_log if "branch" not in entry}
         
-        current_node_name = self.start_node
-        visited_nodes = set()
+        try:
+            await self._with_deadline(self._walk(start_node or self.start_node, state,
+                                                 execution_log, visited_nodes, on_step=on_step))
+        except ExecutionDeadlineError as e:
+            e.state, e.execution_log = state, execution_log
+            raise
+        
+        return state, execution_log
+    
+    async def _with_deadline(self, awaitable: Awaitable):
+        """Await with the graph deadline, cancelling the run when it expires"""
+        if self.deadline is None:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, self.deadline)
+        except asyncio.TimeoutError:
+            raise ExecutionDeadlineError(self.deadline) from None
+    
+    async def _walk(self, current_node_name: Optional[str], state: WorkflowState,
+                    execution_log: List[dict], visited_nodes: Set[str],
+                    branch: Optional[str] = None,
+                    on_step: Optional[StepCallback] = None) -> Optional[str]:
+        """Run nodes from current_node_name until the graph ends.
+        
+        Inside a parallel branch the walk stops on arrival at a join node and
+        returns its name, so the caller can merge branches before running it.
+        """
+        joined_node = None
         
         while current_node_name:
+            # Inline sync tools never yield; without this a deadline could not fire
+            await asyncio.sleep(0)
             if current_node_name not in self.nodes:
                 logger.error(f"Node '{current_node_name}' not found")
                 break
             
-            if current_node_name in visited_nodes and current_node_name != self.start_node:
-                node = self.nodes[current_node_name]
-                if node.node_type != "loop":
+            node = self.nodes[current_node_name]
+            
+            if branch and node.node_type == "join" and current_node_name != joined_node:
+                return current_node_name
+            
+            if current_node_name in self.cycle_guarded:
+                if current_node_name in visited_nodes:
                     logger.warning(f"Cycle detected at node '{current_node_name}', stopping execution")
                     break
-            
-            visited_nodes.add(current_node_name)
-            node = self.nodes[current_node_name]
+                visited_nodes.add(current_node_name)
             
             start_time = datetime.utcnow()
+            started = time.perf_counter()
             try:
                 state = await node.execute(state)
-                status = "success"
                 error = None
             except Exception as e:
-                logger.error(f"Error executing node '{current_node_name}': {e}")
-                status = "error"
                 error = str(e)
             
-            execution_log.append({
-                "node": current_node_name,
-                "timestamp": start_time.isoformat(),
-                "status": status,
-                "error": error,
-                "state_snapshot": state.data.copy()
-            })
+            self._log_step(execution_log, current_node_name, state, start_time,
+                           time.perf_counter() - started, error, branch)
             
-            current_node_name = self._get_next_node(current_node_name, state)
+            targets = await self._get_parallel_targets(current_node_name, state)
+            if targets:
+                fan_out_node = current_node_name
+                current_node_name = await self._fan_out(targets, state, execution_log,
+                                                        visited_nodes, branch)
+                joined_node = current_node_name
+                if current_node_name is None:
+                    self._log_merge(execution_log, fan_out_node, targets, state, branch)
+            else:
+                current_node_name = await self._get_next_node(current_node_name, state)
+            
+            if on_step and not branch:
+                await on_step(state, execution_log, current_node_name)
         
-        return state, execution_log
+        return None
     
-    def _get_next_node(self, current_node: str, state: WorkflowState) -> Optional[str]:
-        """Determine the next node based on edges and conditions"""
-        if current_node not in self.edges:
-            return None
+    def _log_step(self, execution_log: List[dict], node_name: str, state: WorkflowState,
+                  start_time: datetime, duration: float, error: Optional[str],
+                  branch: Optional[str] = None):
+        """Append a log entry carrying a state snapshot or the delta since the last step"""
+        if error:
+            logger.error(f"Error executing node '{node_name}': {error}")
+        metrics.node_duration.observe(duration, node=node_name)
         
-        edges = self.edges[current_node]
+        entry = {
+            "node": node_name,
+            "timestamp": start_time.isoformat(),
+            "duration_ms": round(duration * 1000, 3),
+            "status": "error" if error else "success",
+            "error": error
+        }
+        if state.cache_hit is not None:
+            entry["cache_hit"] = state.cache_hit
+            state.cache_hit = None
+        if branch:
+            entry["branch"] = branch
+            entry["state_delta"] = state.pop_changes()
+        elif len(execution_log) % settings.LOG_CHECKPOINT_INTERVAL == 0:
+            entry["state_snapshot"] = state.data.copy()
+            state.changed_keys.clear()
+        else:
+            entry["state_delta"] = state.pop_changes()
+        execution_log.append(entry)
+    
+    def _log_merge(self, execution_log: List[dict], node_name: str, targets: List[str],
+                   state: WorkflowState, branch: Optional[str] = None):
+        """Record what branches merged in when they end without reaching a join node.
         
-        for edge in edges:
-            if edge.condition:
-                if self._evaluate_condition(edge.condition, state):
-                    return edge.to_node
+        A join node's own entry carries the merged keys; without one they would
+        appear in no entry of the fanning-out line.
+        """
+        changes = state.pop_changes()
+        if not changes:
+            return
+        entry = {
+            "node": node_name,
+            "timestamp": datetime.utcnow().isoformat(),
+            "duration_ms": 0.0,
+            "status": "success",
+            "error": None,
+            "merged_branches": targets,
+            "state_delta": changes
+        }
+        if branch:
+            entry["branch"] = branch
+        execution_log.append(entry)
+    
+    async def execute_batch(self, initial_states: List[Dict]) -> List[tuple]:
+        """Execute the workflow for many initial states in lockstep.
         
-        for edge in edges:
-            if not edge.condition:
-                return edge.to_node
+        Runs standing on the same node execute it together, so tools with a batch
+        implementation are called once per node rather than once per run. Runs
+        diverge freely on conditional edges; parallel branches run per run.
+        Returns one (state, log) pair per initial state, in order.
+        """
+        states = [WorkflowState(initial_state or {}) for initial_state in initial_states]
+        logs: List[List[dict]] = [[] for _ in initial_states]
+        visited: List[Set[str]] = [set() for _ in initial_states]
+        cursors: List[Optional[str]] = [self.start_node] * len(initial_states)
         
-        return None
+        await self._with_deadline(self._run_lockstep(states, logs, visited, cursors))
+        return list(zip(states, logs))
     
-    def _evaluate_condition(self, condition: str, state: WorkflowState) -> bool:
-        """Evaluate edge condition"""
-        try:
-            local_vars = state.data.copy()
-            return eval(condition, {"__builtins__": {}}, local_vars)
-        except Exception as e:
-            logger.error(f"Error evaluating edge condition '{condition}': {e}")
-            return False
+    async def _run_lockstep(self, states: List[WorkflowState], logs: List[List[dict]],
+                            visited: List[Set[str]], cursors: List[Optional[str]]):
+        while True:
+            await asyncio.sleep(0)
+            groups: Dict[str, List[int]] = {}
+            for i, node_name in enumerate(cursors):
+                if not node_name:
+                    continue
+                if node_name not in self.nodes:
+                    logger.error(f"Node '{node_name}' not found")
+                    cursors[i] = None
+                    continue
+                if node_name in self.cycle_guarded and node_name in visited[i]:
+                    logger.warning(f"Cycle detected at node '{node_name}', stopping execution")
+                    cursors[i] = None
+                    continue
+                groups.setdefault(node_name, []).append(i)
+            
+            if not groups:
+                break
+            
+            await asyncio.gather(*(
+                self._step_batch(node_name, indexes, states, logs, visited, cursors)
+                for node_name, indexes in groups.items()
+            ))
+    
+    async def _step_batch(self, node_name: str, indexes: List[int], states: List[WorkflowState],
+                          logs: List[List[dict]], visited: List[Set[str]],
+                          cursors: List[Optional[str]]):
+        """Run one node for a group of batch runs and advance their cursors"""
+        node = self.nodes[node_name]
+        if node_name in self.cycle_guarded:
+            for i in indexes:
+                visited[i].add(node_name)
+        
+        start_time = datetime.utcnow()
+        started = time.perf_counter()
+        errors = await node.execute_batch([states[i] for i in indexes])
+        duration = time.perf_counter() - started
+        
+        async def advance(i: int, error: Optional[str]):
+            self._log_step(logs[i], node_name, states[i], start_time, duration, error)
+            targets = await self._get_parallel_targets(node_name, states[i])
+            if targets:
+                cursors[i] = await self._fan_out(targets, states[i], logs[i], visited[i])
+                if cursors[i] is None:
+                    self._log_merge(logs[i], node_name, targets, states[i])
+            else:
+                cursors[i] = await self._get_next_node(node_name, states[i])
+        
+        await asyncio.gather(*(advance(i, error) for i, error in zip(indexes, errors)))
+    
+    async def _fan_out(self, targets: List[str], state: WorkflowState,
+                       execution_log: List[dict], visited_nodes: Set[str],
+                       parent_branch: Optional[str] = None) -> Optional[str]:
+        """Run branches concurrently, merge their state and return the join node"""
+        branch_states = [state.fork() for _ in targets]
+        branch_logs: List[List[dict]] = [[] for _ in targets]
+        
+        joins = await asyncio.gather(*(
+            self._walk(target, branch_state, branch_log, set(visited_nodes),
+                       branch=f"{parent_branch}/{target}" if parent_branch else target)
+            for target, branch_state, branch_log in zip(targets, branch_states, branch_logs)
+        ))
+        
+        state.merge(branch_states, self.merge_strategies)
+        for branch_log in branch_logs:
+            execution_log.extend(branch_log)
+        
+        join_nodes = {join for join in joins if join}
+        if len(join_nodes) > 1:
+            logger.error(f"Parallel branches {targets} converge on different join nodes {sorted(join_nodes)}")
+            return None
+        return join_nodes.pop() if join_nodes else None
+    
+    async def _get_parallel_targets(self, current_node: str, state: WorkflowState) -> List[str]:
+        """Targets of the fan-out edges whose condition (if any) holds"""
+        successors = self.successors[current_node]
+        return successors.parallel_targets(await blob_store.resolve(state.data, successors.names))
+    
+    async def _get_next_node(self, current_node: str, state: WorkflowState) -> Optional[str]:
+        """Determine the next node from the precomputed successor table"""
+        successors = self.successors[current_node]
+        return successors.next_node(await blob_store.resolve(state.data, successors.names))
@@ -0,0 +1,54 @@
+from collections import OrderedDict
+from typing import Dict, Optional
+import logging
+from app.core.engine import WorkflowEngine
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+class EngineCache:
+    """Bounded LRU cache of compiled WorkflowEngine instances keyed by graph_id"""
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self._engines: "OrderedDict[str, WorkflowEngine]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, graph_id: str) -> Optional[WorkflowEngine]:
+        engine = self._engines.get(graph_id)
+        if engine is None:
+            self.misses += 1
+            return None
+        self._engines.move_to_end(graph_id)
+        self.hits += 1
+        return engine
+
+    def put(self, graph_id: str, engine: WorkflowEngine):
+        """Insert or replace the compiled engine for a graph"""
+        self._engines[graph_id] = engine
+        self._engines.move_to_end(graph_id)
+        while len(self._engines) > self.max_size:
+            evicted, _ = self._engines.popitem(last=False)
+            self.evictions += 1
+            logger.debug(f"Evicted compiled engine for graph {evicted}")
+
+    def invalidate(self, graph_id: str):
+        self._engines.pop(graph_id, None)
+
+    def clear(self):
+        self._engines.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._engines),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+engine_cache = EngineCache(settings.ENGINE_CACHE_SIZE)
@@ -0,0 +1,72 @@
+from typing import Any, Dict, NamedTuple, Optional, Set
+from contextvars import ContextVar
+import asyncio
+import json
+import logging
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+class Event(NamedTuple):
+    first_step: int
+    step_count: int
+    final: bool
+    message: str
+
+RESYNC = Event(0, 0, False, "")
+
+# The execution whose workflow is running in the current task, so long-running
+# tools can stream their own progress events
+current_execution_id: ContextVar[Optional[str]] = ContextVar("current_execution_id", default=None)
+
+class EventBus:
+    """In-process pub/sub of execution progress.
+    
+    Each event is encoded once and the same message is handed to every
+    subscriber of the execution. A subscriber that falls too far behind is
+    sent RESYNC and should reload the full execution state.
+    """
+    
+    def __init__(self, max_queue_size: int = 1000):
+        self.max_queue_size = max_queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+    
+    def subscribe(self, execution_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(self.max_queue_size)
+        self._subscribers.setdefault(execution_id, set()).add(queue)
+        return queue
+    
+    def unsubscribe(self, execution_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(execution_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[execution_id]
+    
+    def has_subscribers(self, execution_id: str) -> bool:
+        return execution_id in self._subscribers
+    
+    def publish(self, execution_id: str, payload: Dict[str, Any], first_step: int = 0,
+                step_count: int = 0, final: bool = False):
+        subscribers = self._subscribers.get(execution_id)
+        if not subscribers:
+            return
+        
+        event = Event(first_step, step_count, final, json.dumps(payload))
+        for queue in subscribers:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                logger.warning(f"Subscriber to {execution_id} fell behind, requesting resync")
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+    
+    def stats(self) -> Dict[str, int]:
+        return {
+            "executions": len(self._subscribers),
+            "subscribers": sum(len(queues) for queues in self._subscribers.values())
+        }
+
+event_bus = EventBus(settings.EVENT_QUEUE_SIZE)
@@ -0,0 +1,114 @@
+from collections import OrderedDict
+from typing import Dict, Optional
+import logging
+import time
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+class ExecutionStore:
+    """In-memory execution records with LRU, TTL and memory-ceiling eviction.
+    
+    Queued and running executions are pinned. Finished executions are kept in
+    decoded form until they expire or are evicted, after which they are
+    served from the database.
+    """
+    
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 300,
+                 max_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._expires: Dict[str, float] = {}
+        self._sizes: Dict[str, int] = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, execution_id: str, touch: bool = True) -> Optional[dict]:
+        record = self._entries.get(execution_id)
+        if record is None:
+            self.misses += 1
+            return None
+        if self._is_expired(execution_id):
+            self._remove(execution_id)
+            self.misses += 1
+            return None
+        if touch:
+            self._entries.move_to_end(execution_id)
+        self.hits += 1
+        return record
+    
+    def put(self, execution_id: str, record: dict, size: int = 0):
+        """Insert or replace a record; size is its approximate encoded size in bytes"""
+        self._remove(execution_id)
+        self._entries[execution_id] = record
+        if record.get("status") not in ACTIVE_STATUSES:
+            self._expires[execution_id] = time.monotonic() + self.ttl_seconds
+            self._sizes[execution_id] = size
+            self.total_bytes += size
+        self._evict()
+    
+    def pop(self, execution_id: str) -> Optional[dict]:
+        record = self._entries.get(execution_id)
+        self._remove(execution_id)
+        return record
+    
+    def stats(self) -> Dict[str, float]:
+        return {
+            "entries": len(self._entries),
+            "active": sum(1 for key in self._entries if key not in self._expires),
+            "bytes": self.total_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+    
+    def _is_expired(self, execution_id: str) -> bool:
+        expires = self._expires.get(execution_id)
+        return expires is not None and expires <= time.monotonic()
+    
+    def _remove(self, execution_id: str):
+        if self._entries.pop(execution_id, None) is None:
+            return
+        self._expires.pop(execution_id, None)
+        self.total_bytes -= self._sizes.pop(execution_id, 0)
+    
+    def _evict(self):
+        """Drop expired records, then least-recently-used finished ones over the limits"""
+        now = time.monotonic()
+        count = len(self._entries)
+        total_bytes = self.total_bytes
+        victims = []
+        
+        for execution_id in self._entries:
+            expires = self._expires.get(execution_id)
+            if expires is None:
+                continue
+            over_limit = count > self.max_entries or total_bytes > self.max_bytes
+            if not over_limit and expires > now:
+                break
+            victims.append(execution_id)
+            count -= 1
+            total_bytes -= self._sizes[execution_id]
+        
+        for execution_id in victims:
+            self._remove(execution_id)
+        if victims:
+            self.evictions += len(victims)
+            logger.debug(f"Evicted {len(victims)} finished executions from memory")
+
+execution_store = ExecutionStore(
+    settings.EXECUTION_STORE_MAX_ENTRIES,
+    settings.EXECUTION_STORE_TTL_SECONDS,
+    settings.EXECUTION_STORE_MAX_BYTES
+)
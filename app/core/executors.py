@@ -0,0 +1,49 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from enum import Enum
+from typing import Optional
+import logging
+import os
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+class ToolExecutor(str, Enum):
+    INLINE = "inline"
+    THREAD = "thread"
+    PROCESS = "process"
+
+_thread_pool: Optional[ThreadPoolExecutor] = None
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+def get_pool(executor: ToolExecutor) -> Executor:
+    """Return the shared pool for an executor kind, creating it on first use"""
+    global _thread_pool, _process_pool
+    
+    if executor == ToolExecutor.THREAD:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(
+                max_workers=settings.TOOL_THREAD_POOL_SIZE,
+                thread_name_prefix="tool"
+            )
+            logger.info(f"Started tool thread pool ({settings.TOOL_THREAD_POOL_SIZE} workers)")
+        return _thread_pool
+    
+    if executor == ToolExecutor.PROCESS:
+        if _process_pool is None:
+            workers = settings.TOOL_PROCESS_POOL_SIZE or os.cpu_count() or 1
+            _process_pool = ProcessPoolExecutor(max_workers=workers)
+            logger.info(f"Started tool process pool ({workers} workers)")
+        return _process_pool
+    
+    raise ValueError(f"Executor '{executor}' has no pool")
+
+def shutdown_pools():
+    """Shut down the shared tool pools, waiting for running tools to finish"""
+    global _thread_pool, _process_pool
+    
+    if _thread_pool is not None:
+        _thread_pool.shutdown(wait=True)
+        _thread_pool = None
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=True)
+        _process_pool = None
@@ -1,55 +1,271 @@
-﻿from typing import Optional, Callable
+﻿from typing import Awaitable, Optional, Callable, List
 import asyncio
+import time
+from app.core import metrics
+from app.core.blobs import blob_store
 from app.core.state import WorkflowState
 from app.core.registry import tool_registry
+from app.core.tool_cache import tool_cache
+from app.core.executors import ToolExecutor, get_pool
+from app.core.condition import compile_condition
 import logging
 
 logger = logging.getLogger(__name__)
 
+class NodeTimeoutError(Exception):
+    """Raised when a node runs longer than its timeout"""
+    
+    def __init__(self, node_name: str, timeout: float):
+        super().__init__(f"Node '{node_name}' timed out after {timeout}s")
+        self.node_name = node_name
+        self.timeout = timeout
+
 class Node:
-    def __init__(self, name: str, tool_name: str, node_type: str = "standard",
-                 loop_condition: Optional[str] = None, max_iterations: int = 10):
+    def __init__(self, name: str, tool_name: Optional[str], node_type: str = "standard",
+                 loop_condition: Optional[str] = None, max_iterations: int = 10,
+                 timeout: Optional[float] = None, map_over: Optional[str] = None,
+                 map_as: str = "item", map_output: Optional[str] = None,
+                 map_concurrency: int = 16):
         self.name = name
         self.tool_name = tool_name
         self.node_type = node_type
         self.loop_condition = loop_condition
         self.max_iterations = max_iterations
+        self.timeout = timeout
+        self.map_over = map_over
+        self.map_as = map_as
+        self.map_output = map_output or f"{map_over}_results"
+        self.map_concurrency = map_concurrency
+        self._loop_condition = compile_condition(loop_condition) if loop_condition else None
+    
+    async def _with_timeout(self, awaitable: Awaitable):
+        """Await with the node's timeout, cancelling the work when it expires.
+        
+        Tools already running in a thread or process pool cannot be interrupted;
+        the node stops waiting for them and their result is discarded.
+        """
+        if self.timeout is None:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, self.timeout)
+        except asyncio.TimeoutError:
+            raise NodeTimeoutError(self.name, self.timeout) from None
     
     async def execute(self, state: WorkflowState) -> WorkflowState:
         """Execute the node's tool with the current state"""
+        return await self._with_timeout(self._execute(state))
+    
+    async def _execute(self, state: WorkflowState) -> WorkflowState:
         logger.info(f"Executing node: {self.name}")
         
+        if self.tool_name is None:
+            return state
+        
         tool = tool_registry.get(self.tool_name)
+        executor = tool_registry.get_executor(self.tool_name)
         
-        if self.node_type == "loop" and self.loop_condition:
+        if self.node_type == "loop" and self._loop_condition:
             iteration = 0
             while iteration < self.max_iterations:
-                if not self._evaluate_condition(self.loop_condition, state):
+                await asyncio.sleep(0)  # let a timeout or deadline fire between sync iterations
+                if not await self._loop_holds(state):
                     break
                 
                 state.increment_iteration()
-                result = await self._run_tool(tool, state)
-                state.update(result)
+                await self._apply(state, await self._call_tool(tool, state, executor))
                 iteration += 1
                 logger.info(f"Loop iteration {iteration} completed for node {self.name}")
+            metrics.loop_iterations.observe(iteration, node=self.name)
+        elif self.node_type == "map":
+            await self._execute_map(tool, state, executor)
         else:
-            result = await self._run_tool(tool, state)
-            state.update(result)
+            await self._apply(state, await self._call_tool(tool, state, executor))
         
         return state
     
-    async def _run_tool(self, tool: Callable, state: WorkflowState) -> dict:
-        """Run the tool, handling both sync and async functions"""
-        if asyncio.iscoroutinefunction(tool):
-            return await tool(state.data)
+    async def _loop_holds(self, state: WorkflowState) -> bool:
+        return self._loop_condition(await blob_store.resolve(state.data, self._loop_condition.names))
+    
+    async def _apply(self, state: WorkflowState, result: dict):
+        """Write a tool result into the state, moving its large values to the blob store.
+        
+        Only values at the top level of the state become references, which is
+        all that resolve() looks at; map nodes store their per-item results as is.
+        """
+        state.update(await blob_store.externalize(result))
+    
+    async def _execute_map(self, tool: Callable, state: WorkflowState, executor: ToolExecutor):
+        """Call the tool for every element of state[map_over], at most map_concurrency at a time.
+        
+        Each call sees a shallow copy of the state with the element bound to
+        map_as. Results are stored in element order under map_output; the first
+        failing call cancels the rest and fails the node.
+        """
+        items = state.get(self.map_over)
+        if not isinstance(items, list):
+            raise ValueError(
+                f"Map node '{self.name}' needs a list in '{self.map_over}', got {type(items).__name__}"
+            )
+        
+        results: List[Optional[dict]] = [None] * len(items)
+        indexes = iter(range(len(items)))
+        
+        async def worker():
+            # Workers share one iterator, so only map_concurrency tasks exist however long the list
+            for index in indexes:
+                item_state = state.fork()
+                item_state.data[self.map_as] = items[index]
+                results[index] = await self._call_tool(tool, item_state, executor)
+                if item_state.cache_hit is not None:
+                    state.record_cache_hit(item_state.cache_hit)
+        
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(self.map_concurrency, len(items)))]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            raise
+        
+        logger.info(f"Map node {self.name} ran {len(items)} item(s)")
+        state.set(self.map_output, results)
+    
+    async def _call_tool(self, tool: Callable, state: WorkflowState,
+                         executor: ToolExecutor) -> dict:
+        """Run the tool, serving it from the result cache when it declared its inputs"""
+        key = self._cache_key(tool, state)
+        if key is None:
+            return await self._timed_tool(tool, state, executor)
+        
+        result = await tool_cache.get(key)
+        state.record_cache_hit(result is not None)
+        if result is None:
+            result = await self._timed_tool(tool, state, executor)
+            await tool_cache.put(key, result)
+        return result
+    
+    async def _timed_tool(self, tool: Callable, state: WorkflowState,
+                          executor: ToolExecutor) -> dict:
+        started = time.perf_counter()
+        result = await self._run_tool(tool, state, executor)
+        metrics.tool_duration.observe(time.perf_counter() - started, tool=self.tool_name)
+        return result
+    
+    def _cache_key(self, tool: Callable, state: WorkflowState) -> Optional[str]:
+        reads = tool_registry.get_reads(self.tool_name)
+        if reads is None:
+            return None
+        fingerprint = tool_registry.get_fingerprint(self.tool_name)
+        return tool_cache.key(self.tool_name, tool, reads, state.data,
+                              fingerprint(state.data) if fingerprint else None,
+                              tool_registry.get_version(self.tool_name))
+    
+    async def execute_batch(self, states: List[WorkflowState]) -> List[Optional[str]]:
+        """Execute the node for many states at once, returning an error (or None) per state.
+        
+        Tools with a batch implementation are called once with every state that
+        needs them; other tools run concurrently, one call per state.
+        """
+        batch_tool = tool_registry.get_batch(self.tool_name) if self.tool_name else None
+        if batch_tool is None or self.node_type == "map":
+            return await asyncio.gather(*(self._execute_caught(state) for state in states))
+        
+        logger.info(f"Executing node: {self.name} (batch of {len(states)})")
+        try:
+            await self._with_timeout(self._execute_batch_tool(batch_tool, states))
+        except Exception as e:
+            return [str(e)] * len(states)
+        
+        return [None] * len(states)
+    
+    async def _execute_batch_tool(self, batch_tool: Callable, states: List[WorkflowState]):
+        executor = tool_registry.get_executor(self.tool_name)
+        if self.node_type == "loop" and self._loop_condition:
+            iterations_before = [state.metadata["iteration_count"] for state in states]
+            pending = states
+            iteration = 0
+            while iteration < self.max_iterations:
+                pending = [state for state in pending if await self._loop_holds(state)]
+                if not pending:
+                    break
+                for state in pending:
+                    state.increment_iteration()
+                await self._run_batch_tool(batch_tool, pending, executor)
+                iteration += 1
+                logger.info(f"Loop iteration {iteration} completed for node {self.name}")
+            for state, before in zip(states, iterations_before):
+                metrics.loop_iterations.observe(state.metadata["iteration_count"] - before,
+                                                node=self.name)
         else:
-            return tool(state.data)
+            await self._run_batch_tool(batch_tool, states, executor)
     
-    def _evaluate_condition(self, condition: str, state: WorkflowState) -> bool:
-        """Evaluate a condition string against the state"""
+    async def _execute_caught(self, state: WorkflowState) -> Optional[str]:
         try:
-            local_vars = state.data.copy()
-            return eval(condition, {"__builtins__": {}}, local_vars)
+            await self.execute(state)
+            return None
         except Exception as e:
-            logger.error(f"Error evaluating condition '{condition}': {e}")
-            return False
+            return str(e)
+    
+    async def _run_batch_tool(self, batch_tool: Callable, states: List[WorkflowState],
+                              executor: ToolExecutor):
+        """Call a batch tool once for all states missing from the result cache and apply each result"""
+        tool = tool_registry.get(self.tool_name)
+        pending = []
+        keys = []
+        for state in states:
+            key = self._cache_key(tool, state)
+            cached = await tool_cache.get(key) if key is not None else None
+            if key is not None:
+                state.record_cache_hit(cached is not None)
+            if cached is not None:
+                await self._apply(state, cached)
+            else:
+                pending.append(state)
+                keys.append(key)
+        if not pending:
+            return
+        
+        reads = tool_registry.get_reads(self.tool_name)
+        data = [await blob_store.resolve(state.data, reads) for state in pending]
+        started = time.perf_counter()
+        if asyncio.iscoroutinefunction(batch_tool):
+            results = await batch_tool(data)
+        elif executor == ToolExecutor.INLINE:
+            results = batch_tool(data)
+        else:
+            loop = asyncio.get_running_loop()
+            if executor == ToolExecutor.PROCESS:
+                data = [dict(item) for item in data]
+            results = await loop.run_in_executor(get_pool(executor), batch_tool, data)
+        
+        if len(results) != len(pending):
+            raise ValueError(
+                f"Batch tool '{self.tool_name}' returned {len(results)} results for {len(pending)} states"
+            )
+        # Attribute the batch call evenly to the states it served
+        share = (time.perf_counter() - started) / len(pending)
+        for _ in pending:
+            metrics.tool_duration.observe(share, tool=self.tool_name)
+        for state, key, result in zip(pending, keys, results):
+            await self._apply(state, result)
+            if key is not None:
+                await tool_cache.put(key, result)
+    
+    async def _run_tool(self, tool: Callable, state: WorkflowState,
+                        executor: ToolExecutor = ToolExecutor.INLINE) -> dict:
+        """Run the tool, handling both sync and async functions.
+        
+        Sync tools registered with a thread or process executor run in the shared
+        pool so they do not block the event loop. Values held as blob references
+        are resolved first, only for the keys the tool reads if it declared them.
+        """
+        data = await blob_store.resolve(state.data, tool_registry.get_reads(self.tool_name))
+        if asyncio.iscoroutinefunction(tool):
+            return await tool(data)
+        if executor == ToolExecutor.INLINE:
+            return tool(data)
+        
+        loop = asyncio.get_running_loop()
+        if executor == ToolExecutor.PROCESS:
+            data = dict(data)
+        return await loop.run_in_executor(get_pool(executor), tool, data)
@@ -0,0 +1,126 @@
+from typing import Any, Awaitable, Dict, List
+import cProfile
+import linecache
+import os
+import pstats
+import time
+import tracemalloc
+import types
+
+_tracemalloc_users = 0
+_tracemalloc_started = False  # whether profiling turned tracing on, so it should turn it off
+
+class ExecutionProfiler:
+    """cProfile and tracemalloc for a single execution.
+
+    The profiler is enabled only while the execution's own task is running a
+    step and disabled whenever it awaits, so other executions interleaved on
+    the event loop are neither profiled nor slowed down by cProfile. Work in
+    tool pools and in tasks the execution spawns (parallel branches) is not
+    attributed. tracemalloc is process-wide in CPython, so allocation tracing
+    runs only while at least one profiled execution is active, and every
+    execution running meanwhile pays its overhead. Tracing that was already
+    on is left on. The peak is reported relative to the traced size when the
+    run started; runs that overlap share one peak, so each sees an upper bound.
+    """
+
+    def __init__(self, top_n: int = 30):
+        self.top_n = top_n
+        self.profiler = cProfile.Profile()
+        self.wall_time = 0.0
+        self.peak_memory = 0
+        self._start_snapshot = None
+        self._end_snapshot = None
+
+    async def run(self, awaitable: Awaitable) -> Any:
+        global _tracemalloc_users, _tracemalloc_started
+        if _tracemalloc_users == 0:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _tracemalloc_started = True
+            # Only with no other profiled run active, whose peak this would clobber
+            tracemalloc.reset_peak()
+        _tracemalloc_users += 1
+        start_memory = tracemalloc.get_traced_memory()[0]
+        self._start_snapshot = tracemalloc.take_snapshot()
+        started = time.perf_counter()
+        try:
+            return await self._step_under_profiler(awaitable.__await__())
+        finally:
+            self.wall_time = time.perf_counter() - started
+            self._end_snapshot = tracemalloc.take_snapshot()
+            self.peak_memory = max(0, tracemalloc.get_traced_memory()[1] - start_memory)
+            _tracemalloc_users -= 1
+            if _tracemalloc_users == 0 and _tracemalloc_started:
+                tracemalloc.stop()
+                _tracemalloc_started = False
+
+    @types.coroutine
+    def _step_under_profiler(self, steps):
+        """Drive the wrapped coroutine, profiling only its own steps"""
+        message, error = None, None
+        while True:
+            self.profiler.enable()
+            try:
+                yielded = steps.throw(error) if error is not None else steps.send(message)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.profiler.disable()
+            message, error = None, None
+            try:
+                message = yield yielded
+            except BaseException as e:
+                error = e
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "wall_time_ms": round(self.wall_time * 1000, 3),
+            "peak_traced_memory_kb": round(self.peak_memory / 1024, 1),
+            "top_functions": self._top_functions(),
+            "top_allocations": self._top_allocations()
+        }
+
+    def _top_functions(self) -> List[Dict[str, Any]]:
+        stats = pstats.Stats(self.profiler)
+        rows = []
+        for (filename, line, name), (_, calls, total, cumulative, _) in stats.stats.items():
+            if name.endswith("of 'coroutine_wrapper' objects>"):
+                continue  # the driver stepping the execution, not the execution itself
+            rows.append({
+                "function": f"{_short_path(filename)}:{line}({name})",
+                "calls": calls,
+                "total_time_ms": round(total * 1000, 3),
+                "cumulative_time_ms": round(cumulative * 1000, 3)
+            })
+        rows.sort(key=lambda row: row["cumulative_time_ms"], reverse=True)
+        return rows[:self.top_n]
+
+    def _top_allocations(self) -> List[Dict[str, Any]]:
+        if self._start_snapshot is None or self._end_snapshot is None:
+            return []
+        ignored = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            tracemalloc.Filter(False, __file__)
+        ]
+        start = self._start_snapshot.filter_traces(ignored)
+        end = self._end_snapshot.filter_traces(ignored)
+        allocations = []
+        for diff in end.compare_to(start, "lineno")[:self.top_n]:
+            frame = diff.traceback[0]
+            allocations.append({
+                "site": f"{_short_path(frame.filename)}:{frame.lineno}",
+                "code": linecache.getline(frame.filename, frame.lineno).strip(),
+                "size_kb": round(diff.size_diff / 1024, 1),
+                "count": diff.count_diff
+            })
+        return allocations
+
+def _short_path(filename: str) -> str:
+    """Path relative to the working directory when inside it, for readable reports"""
+    try:
+        relative = os.path.relpath(filename)
+    except ValueError:
+        return filename
+    return filename if relative.startswith("..") else relative
@@ -1,16 +1,60 @@
-﻿from typing import Callable, Dict
+﻿from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Union
+from functools import partial
 import logging
+from app.core.executors import ToolExecutor
 
 logger = logging.getLogger(__name__)
 
 class ToolRegistry:
     def __init__(self):
         self.tools: Dict[str, Callable] = {}
+        self.executors: Dict[str, ToolExecutor] = {}
+        self.batch_tools: Dict[str, Callable] = {}
+        self.reads: Dict[str, Tuple[str, ...]] = {}
+        self.fingerprints: Dict[str, Callable[[dict], Any]] = {}
+        self.versions: Dict[str, str] = {}
     
-    def register(self, name: str, func: Callable):
-        """Register a tool function"""
+    def register(self, name: str, func: Callable,
+                 executor: Union[ToolExecutor, str] = ToolExecutor.INLINE,
+                 batch_func: Optional[Callable] = None,
+                 reads: Optional[Iterable[str]] = None,
+                 fingerprint: Optional[Callable[[dict], Any]] = None,
+                 version: Optional[str] = None):
+        """Register a tool function and where its sync calls should run.
+        
+        batch_func, if given, takes a list of state dicts and returns one result
+        per state; batch runs call it once per node instead of once per state.
+        reads declares the only state keys a pure tool depends on, which lets its
+        results be memoized by the values of those keys. fingerprint, if given,
+        maps the state to extra key material for inputs that can change while
+        the values stay the same, such as the file a path names. Bump version
+        when the code a cached tool calls changes; edits to the tool function
+        itself are detected on their own.
+        """
+        executor = ToolExecutor(executor)
+        if executor == ToolExecutor.PROCESS:
+            for candidate in (func, batch_func):
+                if candidate is not None and not _is_module_level(candidate):
+                    raise ValueError(f"Tool '{name}' must be a module-level function to run in a process pool")
         self.tools[name] = func
-        logger.info(f"Registered tool: {name}")
+        self.executors[name] = executor
+        if batch_func is not None:
+            self.batch_tools[name] = batch_func
+        else:
+            self.batch_tools.pop(name, None)
+        if reads is not None:
+            self.reads[name] = tuple(sorted(reads))
+        else:
+            self.reads.pop(name, None)
+        if fingerprint is not None:
+            self.fingerprints[name] = fingerprint
+        else:
+            self.fingerprints.pop(name, None)
+        if version is not None:
+            self.versions[name] = version
+        else:
+            self.versions.pop(name, None)
+        logger.info(f"Registered tool: {name} ({executor.value}{', batched' if batch_func else ''})")
     
     def get(self, name: str) -> Callable:
         """Get a tool by name"""
@@ -18,8 +62,31 @@ class ToolRegistry:
             raise ValueError(f"Tool '{name}' not found in registry")
         return self.tools[name]
     
+    def get_executor(self, name: str) -> ToolExecutor:
+        return self.executors.get(name, ToolExecutor.INLINE)
+    
+    def get_reads(self, name: str) -> Optional[Tuple[str, ...]]:
+        """State keys a tool declared as its only inputs, or None if it is not cacheable"""
+        return self.reads.get(name)
+    
+    def get_fingerprint(self, name: str) -> Optional[Callable[[dict], Any]]:
+        return self.fingerprints.get(name)
+    
+    def get_version(self, name: str) -> Optional[str]:
+        return self.versions.get(name)
+    
+    def get_batch(self, name: str) -> Optional[Callable]:
+        """Get a tool's vectorized implementation, if it has one"""
+        return self.batch_tools.get(name)
+    
     def list_tools(self) -> list:
         """List all registered tools"""
         return list(self.tools.keys())
 
-tool_registry = ToolRegistry()
+def _is_module_level(func: Callable) -> bool:
+    """Whether func can be pickled by reference for a process pool"""
+    if isinstance(func, partial):
+        return _is_module_level(func.func)
+    return "<" not in getattr(func, "__qualname__", "<")
+
+tool_registry = ToolRegistry()
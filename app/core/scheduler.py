@@ -0,0 +1,166 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import itertools
+import logging
+import math
+import time
+from app.config import settings
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[], Awaitable[None]]
+
+class QueueFullError(Exception):
+    """Raised when the execution queue is at capacity"""
+    
+    def __init__(self, retry_after: int):
+        super().__init__(f"Execution queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class ExecutionScheduler:
+    """Bounded worker set draining a bounded priority queue of executions.
+    
+    Higher priority values run first; equal priorities run in submission order.
+    """
+    
+    def __init__(self, max_workers: int = 10, max_queue_size: int = 100):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers: List[asyncio.Task] = []
+        self._sequence = itertools.count()
+        self._pending: Dict[str, Tuple[int, int, float]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._cancel_requested: Dict[str, asyncio.Future] = {}
+        self.running: Dict[str, float] = {}
+        self.completed = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+    
+    async def start(self):
+        if self._workers:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [
+            asyncio.create_task(self._worker(i)) for i in range(self.max_workers)
+        ]
+        logger.info(f"Execution scheduler started ({self.max_workers} workers, queue {self.max_queue_size})")
+    
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        self._pending.clear()
+        self._tasks.clear()
+        self._cancel_requested.clear()
+        self.running.clear()
+    
+    def submit(self, execution_id: str, job: Job, priority: int = 0) -> int:
+        """Queue a job and return its position, or raise QueueFullError"""
+        if self._queue is None:
+            raise RuntimeError("Execution scheduler is not running")
+        self.check_capacity()
+        
+        key = (-priority, next(self._sequence))
+        self._pending[execution_id] = (*key, time.monotonic())
+        self._queue.put_nowait((*key, execution_id, job))
+        return self.queue_position(execution_id)
+    
+    def check_capacity(self):
+        """Raise QueueFullError if a job submitted now would be rejected"""
+        if len(self._pending) >= self.max_queue_size:
+            raise QueueFullError(self.retry_after())
+    
+    def queue_position(self, execution_id: str) -> Optional[int]:
+        """Zero-based position in the queue, or None if not queued"""
+        entry = self._pending.get(execution_id)
+        if entry is None:
+            return None
+        return sum(1 for other in self._pending.values() if other[:2] < entry[:2])
+    
+    async def cancel(self, execution_id: str) -> Optional[str]:
+        """Cancel a queued or running job and return which it was, or None if unknown.
+        
+        A running job is cancelled with asyncio cancellation and awaited, so its
+        worker is free again when this returns.
+        """
+        if self._pending.pop(execution_id, None) is not None:
+            return "queued"
+        task = self._tasks.get(execution_id)
+        if task is None:
+            return None
+        finished = self._cancel_requested.get(execution_id)
+        if finished is None:
+            finished = self._cancel_requested[execution_id] = asyncio.get_running_loop().create_future()
+            task.cancel()
+        await asyncio.shield(finished)
+        return "running"
+    
+    def cancel_requested(self, execution_id: str) -> bool:
+        """Whether a running job's cancellation came from cancel() rather than shutdown"""
+        return execution_id in self._cancel_requested
+    
+    def queue_depth(self) -> int:
+        return len(self._pending)
+    
+    def queued_for(self, execution_id: str) -> Optional[float]:
+        """Seconds a still-queued execution has been waiting"""
+        entry = self._pending.get(execution_id)
+        return time.monotonic() - entry[2] if entry else None
+    
+    def retry_after(self) -> int:
+        """Estimated seconds until a queue slot frees up"""
+        avg_run = self.total_run / self.completed if self.completed else 1.0
+        return max(1, math.ceil(avg_run * (len(self._pending) + 1) / self.max_workers))
+    
+    def stats(self) -> Dict[str, float]:
+        return {
+            "queue_depth": len(self._pending),
+            "max_queue_size": self.max_queue_size,
+            "running": len(self.running),
+            "max_workers": self.max_workers,
+            "completed": self.completed,
+            "avg_wait_ms": (self.total_wait / self.completed * 1000) if self.completed else 0.0
+        }
+    
+    async def _worker(self, worker_id: int):
+        while True:
+            _, sequence, execution_id, job = await self._queue.get()
+            entry = self._pending.get(execution_id)
+            if entry is None or entry[1] != sequence:
+                # Cancelled while queued (and possibly queued again since)
+                self._queue.task_done()
+                continue
+            del self._pending[execution_id]
+            started = time.monotonic()
+            wait = started - entry[2]
+            self.running[execution_id] = wait
+            metrics.queue_wait.observe(wait)
+            self._tasks[execution_id] = asyncio.current_task()
+            try:
+                await job()
+            except asyncio.CancelledError:
+                if execution_id not in self._cancel_requested:
+                    raise
+                logger.info(f"Execution {execution_id} cancelled in worker {worker_id}")
+            except Exception as e:
+                logger.error(f"Execution {execution_id} failed in worker {worker_id}: {e}")
+            finally:
+                self._tasks.pop(execution_id, None)
+                finished = self._cancel_requested.pop(execution_id, None)
+                if finished is not None:
+                    # Cancelled through cancel(): the worker lives on
+                    asyncio.current_task().uncancel()
+                    finished.set_result(None)
+                self.running.pop(execution_id, None)
+                self.completed += 1
+                self.total_wait += wait
+                self.total_run += time.monotonic() - started
+                self._queue.task_done()
+
+scheduler = ExecutionScheduler(settings.MAX_CONCURRENT_EXECUTIONS, settings.EXECUTION_QUEUE_SIZE)
+metrics.executions_running.set_function(lambda: len(scheduler.running))
+metrics.executions_queued.set_function(scheduler.queue_depth)
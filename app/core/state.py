@@ -1,9 +1,13 @@
-﻿from typing import Any, Dict
+﻿from typing import Any, Dict, List, Optional, Set
 from datetime import datetime
+from app.models.schemas import MergeStrategy
 
 class WorkflowState:
     def __init__(self, initial_state: Dict[str, Any] = None):
         self.data = initial_state or {}
+        self.changed_keys: Set[str] = set()
+        self.written_keys: Set[str] = set()
+        self.cache_hit: Optional[bool] = None
         self.metadata = {
             "created_at": datetime.utcnow().isoformat(),
             "iteration_count": 0
@@ -14,13 +18,58 @@ class WorkflowState:
     
     def set(self, key: str, value: Any):
         self.data[key] = value
+        self.changed_keys.add(key)
+        self.written_keys.add(key)
     
     def update(self, updates: Dict[str, Any]):
         self.data.update(updates)
+        self.changed_keys.update(updates)
+        self.written_keys.update(updates)
+    
+    def record_cache_hit(self, hit: bool):
+        """Note whether a tool call was served from the result cache; a step hits only if all its calls did"""
+        self.cache_hit = hit if self.cache_hit is None else self.cache_hit and hit
     
     def increment_iteration(self):
         self.metadata["iteration_count"] += 1
     
+    def pop_changes(self) -> Dict[str, Any]:
+        """Return the keys changed since the last call, and reset tracking"""
+        changes = {key: self.data[key] for key in self.changed_keys if key in self.data}
+        self.changed_keys.clear()
+        return changes
+    
+    def fork(self) -> 'WorkflowState':
+        """Shallow copy for a parallel branch, with its own change tracking"""
+        branch = WorkflowState(dict(self.data))
+        branch.metadata = dict(self.metadata)
+        return branch
+    
+    def merge(self, branches: List['WorkflowState'],
+              strategies: Dict[str, MergeStrategy]):
+        """Fold the keys each branch wrote back in, in branch order"""
+        base_iterations = self.metadata["iteration_count"]
+        for branch in branches:
+            for key in sorted(branch.written_keys):
+                value = branch.data[key]
+                strategy = strategies.get(key, MergeStrategy.OVERWRITE)
+                if strategy == MergeStrategy.APPEND:
+                    merged = list(self.data.get(key) or [])
+                    if isinstance(value, list):
+                        merged.extend(value)
+                    else:
+                        merged.append(value)
+                    self.data[key] = merged
+                elif strategy == MergeStrategy.SUM:
+                    self.data[key] = self.data.get(key, 0) + value
+                else:
+                    self.data[key] = value
+                self.changed_keys.add(key)
+                self.written_keys.add(key)
+            self.metadata["iteration_count"] += (
+                branch.metadata["iteration_count"] - base_iterations
+            )
+    
     def to_dict(self) -> Dict[str, Any]:
         return {
             "data": self.data,
@@ -32,4 +81,46 @@ class WorkflowState:
         instance = cls()
         instance.data = state_dict.get("data", {})
         instance.metadata = state_dict.get("metadata", {})
-        return instance
+        return instance
+
+def reconstruct_state(execution_log: List[Dict[str, Any]], step: int) -> Dict[str, Any]:
+    """Rebuild the full state after a log step from checkpoints and deltas.
+    
+    Branch entries carry deltas relative to their own branch, which starts
+    from the state of its parent (the main line, or the enclosing branch).
+    """
+    if not 0 <= step < len(execution_log):
+        raise IndexError(f"Step {step} out of range (0-{len(execution_log) - 1})")
+    
+    main: Dict[str, Any] = {}
+    branches: Dict[str, Dict[str, Any]] = {}
+    
+    for entry in execution_log[:step + 1]:
+        branch: Optional[str] = entry.get("branch")
+        if branch is None:
+            branches.clear()
+            target = main
+        else:
+            for name in [name for name in branches if name.startswith(branch + "/")]:
+                del branches[name]
+            if branch not in branches:
+                parent = branch.rpartition("/")[0]
+                branches[branch] = dict(branches.get(parent, main) if parent else main)
+            target = branches[branch]
+        
+        if "state_snapshot" in entry:
+            target.clear()
+            target.update(entry["state_snapshot"])
+        else:
+            target.update(entry.get("state_delta", {}))
+    
+    return dict(target)
+
+def merge_log_deltas(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine the main-line state changes recorded by consecutive log entries"""
+    changes: Dict[str, Any] = {}
+    for entry in entries:
+        if "branch" in entry:
+            continue
+        changes.update(entry.get("state_snapshot") or entry.get("state_delta") or {})
+    return changes
@@ -0,0 +1,134 @@
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Optional
+import hashlib
+import json
+import logging
+import types
+from app.config import settings
+from app.database import db
+
+logger = logging.getLogger(__name__)
+
+PRUNE_EVERY = 256  # persisted puts between prunes of the SQLite tier
+
+@lru_cache(maxsize=1024)
+def _code_digest(code: types.CodeType) -> str:
+    """Hash of a function's bytecode, names and constants, including nested functions"""
+    digest = hashlib.sha256(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        digest.update(_code_digest(const).encode() if isinstance(const, types.CodeType)
+                      else repr(const).encode())
+    return digest.hexdigest()[:16]
+
+class ToolResultCache:
+    """Content-addressed cache of tool results.
+
+    Results are keyed by a hash of the tool, its code and declared version,
+    and the values of the state keys it declared as inputs. An in-memory LRU
+    sits in front of an optional SQLite tier that survives restarts and is
+    pruned to persist_max_entries rows no older than persist_ttl_seconds.
+    Results are stored encoded, so a cached result can never be mutated
+    through the state it was copied into. Results that do not survive a JSON
+    round trip unchanged (tuples, non-string keys) are not cached, so a hit
+    always returns what the tool would have.
+    """
+
+    def __init__(self, max_entries: int = 1024, persist: bool = False,
+                 persist_max_entries: int = 100_000, persist_ttl_seconds: float = 7 * 24 * 3600):
+        self.max_entries = max_entries
+        self.persist = persist
+        self.persist_max_entries = persist_max_entries
+        self.persist_ttl_seconds = persist_ttl_seconds
+        self._puts_since_prune = 0
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.persisted_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(tool_name: str, func: Callable, reads: Iterable[str], data: Dict[str, Any],
+            fingerprint: Any = None, version: Optional[str] = None) -> Optional[str]:
+        """Hash of a tool call's inputs, or None if they cannot be encoded.
+
+        The tool's own bytecode is part of the key, so editing it invalidates its
+        results; version covers changes in code the tool calls.
+        """
+        func = getattr(func, "func", func)
+        identity = f"{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', '')}"
+        code = getattr(func, "__code__", None)
+        if code is not None:
+            identity += f"@{_code_digest(code)}"
+        try:
+            payload = json.dumps([tool_name, identity, version, {k: data.get(k) for k in reads}, fingerprint],
+                                 sort_keys=True, separators=(",", ":"))
+        except (TypeError, ValueError):
+            return None
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[dict]:
+        encoded = self._entries.get(key)
+        if encoded is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return json.loads(encoded)
+
+        if self.persist:
+            encoded = await db.get_tool_result(key, self.persist_ttl_seconds)
+            if encoded is not None:
+                self._remember(key, encoded)
+                self.persisted_hits += 1
+                return json.loads(encoded)
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, result: dict):
+        try:
+            encoded = json.dumps(result)
+        except (TypeError, ValueError):
+            return
+        if json.loads(encoded) != result:
+            logger.debug(f"Not caching tool result {key}: it changes in a JSON round trip")
+            return
+        self._remember(key, encoded)
+        if self.persist:
+            try:
+                await db.save_tool_result(key, encoded)
+                self._puts_since_prune += 1
+                if self._puts_since_prune >= PRUNE_EVERY:
+                    await self.prune()
+            except Exception as e:
+                logger.error(f"Failed to persist tool result {key}: {e}")
+
+    async def prune(self):
+        """Drop persisted results past their TTL and the oldest beyond persist_max_entries"""
+        self._puts_since_prune = 0
+        removed = await db.prune_tool_results(self.persist_max_entries, self.persist_ttl_seconds)
+        if removed:
+            logger.info(f"Pruned {removed} persisted tool results")
+
+    def _remember(self, key: str, encoded: str):
+        self._entries[key] = encoded
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.persisted_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "persist": self.persist,
+            "hits": self.hits,
+            "persisted_hits": self.persisted_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.persisted_hits) / lookups if lookups else 0.0
+        }
+
+tool_cache = ToolResultCache(settings.TOOL_CACHE_SIZE, settings.TOOL_CACHE_PERSIST,
+                             settings.TOOL_CACHE_PERSIST_MAX_ENTRIES, settings.TOOL_CACHE_PERSIST_TTL_SECONDS)
@@ -0,0 +1,75 @@
+from typing import AsyncIterator, List, Tuple
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_UPLOAD_ID = re.compile(r"[0-9a-f]{64}")
+
+class UploadTooLargeError(Exception):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds the {max_bytes} byte limit")
+        self.max_bytes = max_bytes
+
+def resolve_within(code_path: str, code_roots: List[str]) -> str:
+    """Resolve a file path, following symlinks, refusing anything outside code_roots"""
+    resolved = os.path.realpath(code_path)
+    for root in code_roots:
+        if os.path.commonpath([resolved, root]) == root:
+            return resolved
+    raise PermissionError(f"Path '{code_path}' is outside the configured CODE_ROOTS")
+
+class UploadStore:
+    """Files for inputs too large to carry inline in workflow state.
+
+    Uploads are named by the SHA-256 of their content, so an upload_id always
+    refers to the same bytes and is safe to memoize on. Workflows may also read
+    files by path, but only below the configured code roots.
+    """
+
+    def __init__(self, upload_dir: str, max_bytes: int, code_roots: List[str]):
+        self.upload_dir = upload_dir
+        self.max_bytes = max_bytes
+        self.code_roots = [os.path.realpath(root) for root in code_roots]
+
+    async def save(self, chunks: AsyncIterator[bytes]) -> Tuple[str, int]:
+        """Stream chunks to disk, returning the upload id and size"""
+        os.makedirs(self.upload_dir, exist_ok=True)
+        fd, partial_path = tempfile.mkstemp(dir=self.upload_dir, suffix=".part")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise UploadTooLargeError(self.max_bytes)
+                    digest.update(chunk)
+                    f.write(chunk)
+            upload_id = digest.hexdigest()
+            os.replace(partial_path, os.path.join(self.upload_dir, upload_id))
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+
+        logger.info(f"Stored upload {upload_id} ({size} bytes)")
+        return upload_id, size
+
+    def path(self, upload_id: str) -> str:
+        if not _UPLOAD_ID.fullmatch(upload_id):
+            raise ValueError(f"Invalid upload id '{upload_id}'")
+        path = os.path.join(self.upload_dir, upload_id)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Upload '{upload_id}' not found")
+        return path
+
+    def resolve_code_path(self, code_path: str) -> str:
+        """Resolve a file path, refusing anything outside the code roots"""
+        return resolve_within(code_path, self.code_roots)
+
+upload_store = UploadStore(settings.UPLOAD_DIR, settings.UPLOAD_MAX_BYTES, settings.CODE_ROOTS)
@@ -1,20 +1,78 @@
 ﻿import aiosqlite
-from typing import Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from contextlib import asynccontextmanager
+import asyncio
 import json
+import logging
+import time
 from datetime import datetime
+from app.config import settings
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+# execution_log is only read for rows written before steps moved to execution_steps
+_UPSERT_EXECUTION = """INSERT INTO executions 
+       (id, graph_id, status, current_state, next_node, updated_at) 
+       VALUES (?, ?, ?, ?, ?, ?)
+       ON CONFLICT(id) DO UPDATE SET
+           status = excluded.status,
+           current_state = excluded.current_state,
+           next_node = excluded.next_node,
+           updated_at = excluded.updated_at"""
+
+_INSERT_STEP = """INSERT OR REPLACE INTO execution_steps (execution_id, step, entry)
+       VALUES (?, ?, ?)"""
 
 class Database:
-    def __init__(self, db_path: str = "./workflow_engine.db"):
+    """SQLite access with WAL mode, a read connection pool and group-committed writes.
+    
+    Writes are queued to a single writer task. A write arriving while the
+    writer is idle commits at once; writes arriving while a commit is in flight
+    are committed together in the next transaction, so under load many saves
+    share one fsync. Each caller awaits until its write has been committed.
+    """
+    
+    def __init__(self, db_path: str = "./workflow_engine.db", read_pool_size: int = 4,
+                 max_batch_size: int = 256):
         self.db_path = db_path
+        self.read_pool_size = read_pool_size
+        self.max_batch_size = max_batch_size
         self.connection: Optional[aiosqlite.Connection] = None
+        self._readers: Optional[asyncio.Queue] = None
+        self._reader_connections: List[aiosqlite.Connection] = []
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self.commits = 0
+        self.writes = 0
     
     async def connect(self):
         self.connection = await aiosqlite.connect(self.db_path)
+        await self.connection.execute("PRAGMA journal_mode=WAL")
         await self.create_tables()
+        
+        self._readers = asyncio.Queue()
+        for _ in range(self.read_pool_size):
+            reader = await aiosqlite.connect(self.db_path)
+            self._reader_connections.append(reader)
+            self._readers.put_nowait(reader)
+        
+        self._write_queue = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._write_loop())
     
     async def disconnect(self):
+        if self._writer_task:
+            self._write_queue.put_nowait(_STOP)
+            await self._writer_task
+            self._writer_task = None
+        for reader in self._reader_connections:
+            await reader.close()
+        self._reader_connections = []
         if self.connection:
             await self.connection.close()
+            self.connection = None
     
     async def create_tables(self):
         await self.connection.execute("""
@@ -39,46 +97,460 @@ class Database:
             )
         """)
         
+        await self._add_missing_columns("executions", {"next_node": "TEXT"})
+        
+        # Listing filters on graph and/or status and pages newest first by (created_at, rowid)
+        for name, columns in (
+            ("idx_executions_graph_status_created", "graph_id, status, created_at"),
+            ("idx_executions_graph_created", "graph_id, created_at"),
+            ("idx_executions_status_created", "status, created_at"),
+            ("idx_executions_created", "created_at"),
+        ):
+            await self.connection.execute(f"CREATE INDEX IF NOT EXISTS {name} ON executions ({columns})")
+        
+        await self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS execution_steps (
+                execution_id TEXT NOT NULL,
+                step INTEGER NOT NULL,
+                entry TEXT NOT NULL,
+                PRIMARY KEY (execution_id, step)
+            ) WITHOUT ROWID
+        """)
+        
+        await self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS tool_results (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        await self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tool_results_created ON tool_results (created_at)"
+        )
+        
+        await self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        await self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS execution_profiles (
+                execution_id TEXT PRIMARY KEY,
+                profile TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
         await self.connection.commit()
     
+    async def _add_missing_columns(self, table: str, columns: dict):
+        """Add columns introduced after a database file was first created"""
+        cursor = await self.connection.execute(f"PRAGMA table_info({table})")
+        existing = {row[1] for row in await cursor.fetchall()}
+        for name, column_type in columns.items():
+            if name not in existing:
+                await self.connection.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+    
+    @asynccontextmanager
+    async def _reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Borrow a pooled read connection, or the writer connection if there is no pool"""
+        if not self._reader_connections:
+            yield self.connection
+            return
+        reader = await self._readers.get()
+        try:
+            yield reader
+        finally:
+            self._readers.put_nowait(reader)
+    
+    async def _write(self, sql: str, params: Tuple[Any, ...]):
+        """Queue a write and wait until the transaction containing it commits"""
+        await self._write_many(sql, [params])
+    
+    async def _write_many(self, sql: str, rows: List[Tuple[Any, ...]]):
+        """Queue one statement for many parameter rows, committed together"""
+        if self._writer_task is None:
+            await self.connection.executemany(sql, rows)
+            await self.connection.commit()
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._write_queue.put_nowait((sql, rows, future))
+        await future
+    
+    async def _write_loop(self):
+        stopping = False
+        
+        while not stopping:
+            item = await self._write_queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            
+            # Take whatever queued up during the previous commit, but never wait for more
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._write_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            await self._commit_batch(batch)
+    
+    async def _commit_batch(self, batch: List[tuple]):
+        """Run a batch in one transaction, one executemany per distinct statement.
+        
+        Writes keep their order within a statement; no statement depends on
+        another's rows, so they need not keep their order across statements.
+        If any statement fails, the whole batch is rolled back and its writes
+        are retried one by one, so only the failing write is lost.
+        """
+        groups: Dict[str, List[tuple]] = {}
+        for item in batch:
+            groups.setdefault(item[0], []).append(item)
+        try:
+            for sql, group in groups.items():
+                await self.connection.executemany(sql, [params for _, rows, _ in group for params in rows])
+            await self.connection.commit()
+        except Exception as e:
+            await self.connection.rollback()
+            if len(batch) > 1:
+                logger.warning(f"Group commit of {len(batch)} writes failed ({e}), retrying them one by one")
+                await self._commit_each(batch)
+                return
+            logger.error(f"Write failed: {e}")
+            _, _, future = batch[0]
+            if not future.done():
+                future.set_exception(e)
+            return
+        
+        self.commits += 1
+        self.writes += sum(len(rows) for _, rows, _ in batch)
+        for _, _, future in batch:
+            if not future.done():
+                future.set_result(None)
+    
+    async def _commit_each(self, batch: List[tuple]):
+        """Run each write of a batch under its own savepoint in one transaction.
+        
+        A failing write is rolled back to its savepoint, including any rows
+        its executemany applied before the error, and only its caller gets
+        the exception.
+        """
+        done = []
+        try:
+            await self.connection.execute("BEGIN")
+            for sql, rows, future in batch:
+                await self.connection.execute("SAVEPOINT write")
+                try:
+                    await self.connection.executemany(sql, rows)
+                except Exception as e:
+                    await self.connection.execute("ROLLBACK TO write")
+                    logger.error(f"Write failed: {e}")
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    done.append((rows, future))
+                await self.connection.execute("RELEASE write")
+            await self.connection.commit()
+        except Exception as e:
+            await self.connection.rollback()
+            logger.error(f"Group commit of {len(batch)} writes failed: {e}")
+            for _, future in done:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        self.commits += 1
+        self.writes += sum(len(rows) for rows, _ in done)
+        for _, future in done:
+            if not future.done():
+                future.set_result(None)
+    
     async def save_graph(self, graph_id: str, name: str, definition: dict):
-        await self.connection.execute(
+        await self._write(
             "INSERT OR REPLACE INTO graphs (id, name, definition) VALUES (?, ?, ?)",
             (graph_id, name, json.dumps(definition))
         )
-        await self.connection.commit()
     
     async def get_graph(self, graph_id: str) -> Optional[dict]:
-        cursor = await self.connection.execute(
-            "SELECT definition FROM graphs WHERE id = ?", (graph_id,)
-        )
-        row = await cursor.fetchone()
+        async with self._reader() as conn:
+            cursor = await conn.execute(
+                "SELECT definition FROM graphs WHERE id = ?", (graph_id,)
+            )
+            row = await cursor.fetchone()
         return json.loads(row[0]) if row else None
     
     async def save_execution(self, execution_id: str, graph_id: str, status: str, 
-                            state: dict, log: list):
-        await self.connection.execute(
-            """INSERT OR REPLACE INTO executions 
-               (id, graph_id, status, current_state, execution_log, updated_at) 
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (execution_id, graph_id, status, json.dumps(state), 
-             json.dumps(log), datetime.utcnow().isoformat())
-        )
-        await self.connection.commit()
+                            state: dict, log: list, next_node: Optional[str] = None) -> int:
+        """Persist an execution and return the size of its encoded state and log.
+        
+        next_node is the node a resumed run should start from, for checkpoints of
+        queued or running executions.
+        """
+        sizes = await self.save_executions([(execution_id, graph_id, status, state, log, next_node)])
+        return sizes[0]
     
-    async def get_execution(self, execution_id: str) -> Optional[dict]:
-        cursor = await self.connection.execute(
-            "SELECT graph_id, status, current_state, execution_log FROM executions WHERE id = ?",
-            (execution_id,)
+    async def save_executions(self, executions: List[tuple]) -> List[int]:
+        """Persist many (id, graph_id, status, state, log, next_node) rows in one write"""
+        written = await self._save(
+            [(execution_id, graph_id, status, state, log, 0, next_node)
+             for execution_id, graph_id, status, state, log, next_node in executions]
         )
-        row = await cursor.fetchone()
-        if row:
-            return {
-                "graph_id": row[0],
-                "status": row[1],
-                "state": json.loads(row[2]) if row[2] else {},
-                "log": json.loads(row[3]) if row[3] else []
+        return [state_size + log_size for state_size, log_size in written]
+    
+    async def delete_executions(self, execution_ids: List[str]):
+        """Remove executions that were saved as queued but never accepted by the scheduler"""
+        await self._write_many("DELETE FROM executions WHERE id = ?",
+                               [(execution_id,) for execution_id in execution_ids])
+    
+    async def checkpoint_execution(self, execution_id: str, graph_id: str, status: str,
+                                   state: dict, log: list, first_step: int,
+                                   next_node: Optional[str] = None) -> Tuple[int, int]:
+        """Persist the state and append log entries from first_step on.
+        
+        Earlier entries must already be stored. Returns the encoded size of the
+        state and of the appended entries, so a checkpoint costs the size of
+        what changed rather than of the whole log.
+        """
+        written = await self._save([(execution_id, graph_id, status, state, log, first_step, next_node)])
+        return written[0]
+    
+    async def _save(self, executions: List[tuple]) -> List[Tuple[int, int]]:
+        now = datetime.utcnow().isoformat()
+        rows = []
+        steps = []
+        written = []
+        for execution_id, graph_id, status, state, log, first_step, next_node in executions:
+            state_json = json.dumps(state)
+            rows.append((execution_id, graph_id, status, state_json, next_node, now))
+            log_size = 0
+            for step in range(first_step, len(log)):
+                entry_json = json.dumps(log[step])
+                steps.append((execution_id, step, entry_json))
+                log_size += len(entry_json)
+            written.append((len(state_json), log_size))
+        started = time.perf_counter()
+        writes = [self._write_many(_UPSERT_EXECUTION, rows)]
+        if steps:
+            writes.append(self._write_many(_INSERT_STEP, steps))
+        await asyncio.gather(*writes)
+        metrics.db_save_duration.observe(time.perf_counter() - started)
+        return written
+    
+    async def get_execution(self, execution_id: str, include_log: bool = True) -> Optional[dict]:
+        """An execution with its state and, unless include_log is False, its full log.
+        
+        Without the log, "step_count" gives the number of log entries instead.
+        """
+        async with self._reader() as conn:
+            cursor = await conn.execute(
+                """SELECT graph_id, status, current_state, next_node,
+                          coalesce(json_array_length(execution_log), 0)
+                   FROM executions WHERE id = ?""",
+                (execution_id,)
+            )
+            row = await cursor.fetchone()
+            if row is None:
+                return None
+            if include_log:
+                log, log_size = await self._read_steps(conn, execution_id, 0, None, row[4])
+            else:
+                cursor = await conn.execute(
+                    "SELECT max(step) FROM execution_steps WHERE execution_id = ?", (execution_id,)
+                )
+                last_step = (await cursor.fetchone())[0]
+        
+        exec_data = {
+            "graph_id": row[0],
+            "status": row[1],
+            "state": json.loads(row[2]) if row[2] else {},
+            "next_node": row[3]
+        }
+        if include_log:
+            exec_data.update(log=log, size=len(row[2] or "") + log_size)
+        else:
+            exec_data["step_count"] = max(row[4], last_step + 1 if last_step is not None else 0)
+        return exec_data
+    
+    async def get_steps(self, execution_id: str, first_step: int = 0,
+                        limit: Optional[int] = None) -> List[dict]:
+        """Log entries of an execution from first_step on, at most limit of them"""
+        async with self._reader() as conn:
+            cursor = await conn.execute(
+                "SELECT coalesce(json_array_length(execution_log), 0) FROM executions WHERE id = ?",
+                (execution_id,)
+            )
+            row = await cursor.fetchone()
+            if row is None:
+                return []
+            log, _ = await self._read_steps(conn, execution_id, first_step, limit, row[0])
+        return log
+    
+    async def _read_steps(self, conn: aiosqlite.Connection, execution_id: str, first_step: int,
+                          limit: Optional[int], legacy_length: int) -> Tuple[List[dict], int]:
+        """Read a slice of the log and its encoded size.
+        
+        Rows saved before the step table existed keep their leading entries in
+        the execution_log column; later entries are always in execution_steps.
+        """
+        log: List[dict] = []
+        size = 0
+        if first_step < legacy_length:
+            cursor = await conn.execute(
+                "SELECT execution_log FROM executions WHERE id = ?", (execution_id,)
+            )
+            legacy = (await cursor.fetchone())[0]
+            size += len(legacy)
+            log = json.loads(legacy)[first_step:]
+            if limit is not None:
+                log = log[:limit]
+        
+        remaining = -1 if limit is None else limit - len(log)
+        if remaining:
+            cursor = await conn.execute(
+                """SELECT entry FROM execution_steps
+                   WHERE execution_id = ? AND step >= ? ORDER BY step LIMIT ?""",
+                (execution_id, max(first_step, legacy_length), remaining)
+            )
+            for (entry,) in await cursor.fetchall():
+                size += len(entry)
+                log.append(json.loads(entry))
+        return log, size
+    
+    async def list_executions(self, graph_id: Optional[str] = None, status: Optional[str] = None,
+                              created_after: Optional[str] = None, created_before: Optional[str] = None,
+                              after: Optional[Tuple[str, int]] = None,
+                              limit: int = 50) -> Tuple[List[dict], Optional[Tuple[str, int]]]:
+        """Summaries of executions, newest first, and the key to pass as after for the next page.
+        
+        Pages are keyed by (created_at, rowid) so every page is an index range
+        scan with no sort. The indexes do not cover next_node and updated_at,
+        which are read from the table row, one lookup per returned row; adding
+        updated_at would rewrite every index entry on each checkpoint.
+        """
+        clauses = []
+        params: List[Any] = []
+        if graph_id is not None:
+            clauses.append("graph_id = ?")
+            params.append(graph_id)
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if created_after is not None:
+            clauses.append("created_at >= ?")
+            params.append(created_after)
+        if created_before is not None:
+            clauses.append("created_at < ?")
+            params.append(created_before)
+        if after is not None:
+            clauses.append("(created_at, rowid) < (?, ?)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        
+        async with self._reader() as conn:
+            cursor = await conn.execute(
+                f"""SELECT rowid, id, graph_id, status, next_node, created_at, updated_at
+                    FROM executions {where}
+                    ORDER BY created_at DESC, rowid DESC LIMIT ?""",
+                (*params, limit + 1)
+            )
+            rows = await cursor.fetchall()
+        
+        next_key = (rows[limit - 1][5], rows[limit - 1][0]) if len(rows) > limit else None
+        return [
+            {
+                "execution_id": row[1],
+                "graph_id": row[2],
+                "status": row[3],
+                "next_node": row[4],
+                "created_at": row[5],
+                "updated_at": row[6]
             }
-        return None
+            for row in rows[:limit]
+        ], next_key
+    
+    async def save_tool_result(self, key: str, result_json: str):
+        await self._write(
+            "INSERT OR REPLACE INTO tool_results (key, result) VALUES (?, ?)",
+            (key, result_json)
+        )
+    
+    async def get_tool_result(self, key: str, max_age_seconds: Optional[float] = None) -> Optional[str]:
+        """Encoded result of a memoized tool call, if one was persisted within max_age_seconds"""
+        async with self._reader() as conn:
+            cursor = await conn.execute(
+                """SELECT result FROM tool_results
+                   WHERE key = ? AND (? IS NULL OR created_at >= datetime('now', ?))""",
+                (key, max_age_seconds, f"-{max_age_seconds} seconds")
+            )
+            row = await cursor.fetchone()
+        return row[0] if row else None
+    
+    async def prune_tool_results(self, max_entries: int, max_age_seconds: float) -> int:
+        """Delete persisted tool results older than max_age_seconds or beyond the newest max_entries.
+        
+        Saves replace rows, so rowid order is write order. Returns the number deleted.
+        """
+        where = "created_at < datetime('now', ?) OR rowid <= ?"
+        async with self._reader() as conn:
+            cursor = await conn.execute(
+                "SELECT rowid FROM tool_results ORDER BY rowid DESC LIMIT 1 OFFSET ?", (max_entries,)
+            )
+            row = await cursor.fetchone()
+            params = (f"-{max_age_seconds} seconds", row[0] if row else 0)
+            cursor = await conn.execute(f"SELECT count(*) FROM tool_results WHERE {where}", params)
+            count = (await cursor.fetchone())[0]
+        if count:
+            await self._write(f"DELETE FROM tool_results WHERE {where}", params)
+        return count
+    
+    async def save_blob(self, digest: str, value: str, size: int):
+        """Store a state value by content hash; a value that is already stored is left alone"""
+        await self._write(
+            "INSERT OR IGNORE INTO blobs (digest, value, size) VALUES (?, ?, ?)",
+            (digest, value, size)
+        )
+    
+    async def get_blob(self, digest: str) -> Optional[str]:
+        async with self._reader() as conn:
+            cursor = await conn.execute(
+                "SELECT value FROM blobs WHERE digest = ?", (digest,)
+            )
+            row = await cursor.fetchone()
+        return row[0] if row else None
+    
+    async def save_profile(self, execution_id: str, profile: dict):
+        await self._write(
+            "INSERT OR REPLACE INTO execution_profiles (execution_id, profile) VALUES (?, ?)",
+            (execution_id, json.dumps(profile))
+        )
+    
+    async def get_profile(self, execution_id: str) -> Optional[dict]:
+        async with self._reader() as conn:
+            cursor = await conn.execute(
+                "SELECT profile FROM execution_profiles WHERE execution_id = ?", (execution_id,)
+            )
+            row = await cursor.fetchone()
+        return json.loads(row[0]) if row else None
+    
+    async def get_interrupted_executions(self) -> List[str]:
+        """IDs of executions left queued or running by a previous process"""
+        async with self._reader() as conn:
+            cursor = await conn.execute(
+                "SELECT id FROM executions WHERE status IN ('queued', 'running') ORDER BY created_at"
+            )
+            rows = await cursor.fetchall()
+        return [row[0] for row in rows]
 
-db = Database()
+db = Database(
+    read_pool_size=settings.DB_READ_POOL_SIZE,
+    max_batch_size=settings.DB_MAX_BATCH_SIZE
+)
@@ -1,11 +1,19 @@
 from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 import logging
 
-from app.api.routes import router  # your workflow API routes
+from app.api.routes import router, resume_interrupted_executions  # your workflow API routes
 from app.api.websocket import ws_router   # websocket routes
+from app.config import settings
 from app.database import db
+from app.core.executors import shutdown_pools
+from app.core.metrics import registry as metrics_registry
+from app.core.scheduler import scheduler
+from app.core.tool_cache import tool_cache
 from app.workflows.code_review import register_code_review_tools
+from app.workflows.repository_review import register_repository_review_tools
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -14,10 +22,17 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     logger.info("Starting Workflow Engine...")
     await db.connect()
+    if tool_cache.persist:
+        await tool_cache.prune()
     register_code_review_tools()
+    register_repository_review_tools()
+    await scheduler.start()
+    await resume_interrupted_executions()
     logger.info("Workflow Engine started successfully")
     yield
     logger.info("Shutting down Workflow Engine...")
+    await scheduler.stop()
+    shutdown_pools()
     await db.disconnect()
 
 app = FastAPI(
@@ -27,6 +42,10 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Compress large responses (full states and logs) for clients that accept gzip
+app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MINIMUM_SIZE,
+                   compresslevel=settings.GZIP_COMPRESS_LEVEL)
+
 # Register REST API routes
 app.include_router(router, prefix="/api/v1", tags=["workflows"])
 
@@ -41,6 +60,11 @@ async def root():
         "docs": "/docs"
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of engine metrics"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,29 +1,55 @@
-﻿from pydantic import BaseModel, Field
+﻿from pydantic import BaseModel, Field, model_validator
 from typing import Dict, Any, List, Optional
+from app.config import settings
 from enum import Enum
 
 class NodeType(str, Enum):
     STANDARD = "standard"
     CONDITIONAL = "conditional"
     LOOP = "loop"
+    JOIN = "join"
+    MAP = "map"
+
+class MergeStrategy(str, Enum):
+    OVERWRITE = "overwrite"
+    APPEND = "append"
+    SUM = "sum"
 
 class EdgeConfig(BaseModel):
     from_node: str
     to_node: str
     condition: Optional[str] = None
+    parallel: bool = False
 
 class NodeConfig(BaseModel):
     name: str
     type: NodeType = NodeType.STANDARD
-    tool: str
+    tool: Optional[str] = None
     loop_condition: Optional[str] = None
     max_iterations: Optional[int] = 10
+    timeout_seconds: Optional[float] = Field(None, gt=0)
+    # Map nodes: call the tool once per element of state[map_over], with the
+    # element bound to state[map_as], and collect the results in state[map_output]
+    map_over: Optional[str] = None
+    map_as: str = "item"
+    map_output: Optional[str] = None
+    map_concurrency: Optional[int] = Field(None, gt=0)
+    
+    @model_validator(mode="after")
+    def check_tool(self) -> "NodeConfig":
+        if self.tool is None and self.type != NodeType.JOIN:
+            raise ValueError(f"Node '{self.name}' requires a tool")
+        if self.type == NodeType.MAP and not self.map_over:
+            raise ValueError(f"Map node '{self.name}' requires map_over")
+        return self
 
 class GraphDefinition(BaseModel):
     name: str
     nodes: List[NodeConfig]
     edges: List[EdgeConfig]
     start_node: str
+    merge_strategies: Dict[str, MergeStrategy] = Field(default_factory=dict)
+    deadline_seconds: Optional[float] = Field(None, gt=0)
 
 class CreateGraphRequest(BaseModel):
     definition: GraphDefinition
@@ -31,19 +57,69 @@ class CreateGraphRequest(BaseModel):
 class CreateGraphResponse(BaseModel):
     graph_id: str
     message: str
+    warnings: List[str] = Field(default_factory=list)
 
 class RunGraphRequest(BaseModel):
     graph_id: str
     initial_state: Dict[str, Any] = Field(default_factory=dict)
+    priority: int = 0
+    profile: bool = False
 
 class RunGraphResponse(BaseModel):
     execution_id: str
     status: str
     message: str
 
+class UploadResponse(BaseModel):
+    upload_id: str
+    size: int
+    message: str
+
+class RunBatchRequest(BaseModel):
+    graph_id: str
+    # A batch runs in one scheduler slot, so its size is bounded like the queue
+    initial_states: List[Dict[str, Any]] = Field(..., min_length=1, max_length=settings.MAX_BATCH_SIZE)
+    priority: int = 0
+
+class RunBatchResponse(BaseModel):
+    batch_id: str
+    execution_ids: List[str]
+    status: str
+    message: str
+
 class ExecutionStateResponse(BaseModel):
     execution_id: str
     graph_id: str
     status: str
     current_state: Dict[str, Any]
-    execution_log: List[Dict[str, Any]]
+    execution_log: List[Dict[str, Any]]
+    first_step: int = 0
+    step_count: Optional[int] = None
+    queue_position: Optional[int] = None
+    queue_depth: Optional[int] = None
+    queue_wait_ms: Optional[float] = None
+
+class ExecutionProfileResponse(BaseModel):
+    execution_id: str
+    wall_time_ms: float
+    peak_traced_memory_kb: float
+    top_functions: List[Dict[str, Any]]
+    top_allocations: List[Dict[str, Any]]
+
+class ExecutionSummary(BaseModel):
+    execution_id: str
+    graph_id: str
+    status: str
+    next_node: Optional[str] = None
+    created_at: str
+    updated_at: Optional[str] = None
+
+class ExecutionListResponse(BaseModel):
+    executions: List[ExecutionSummary]
+    next_cursor: Optional[str] = None
+
+class StepStateResponse(BaseModel):
+    execution_id: str
+    step: int
+    node: str
+    state: Dict[str, Any]
@@ -0,0 +1,171 @@
+import mmap
+import os
+import re
+import zlib
+from typing import Any, Dict, Optional
+from app.core.uploads import upload_store
+
+# State keys that can hold the code under review
+SOURCE_KEYS = ("code", "upload_id", "code_path")
+# Part of the cache key of tools built on the analysis: bump when what it reports changes
+ANALYSIS_VERSION = "1"
+DECISION_KEYWORDS = (b"if", b"elif", b"for", b"while", b"and", b"or", b"except")
+LONG_LINE_LIMIT = 100
+MAX_LISTED_FUNCTIONS = 1000
+CHUNK_SIZE = 8 * 1024 * 1024
+
+_MADV_DONTNEED = getattr(mmap, "MADV_DONTNEED", None)
+
+_FUNCTION = re.compile(rb"def[ \t]+([\w\x80-\xff]+)[ \t]*\(")
+_BARE_EXCEPT = re.compile(rb"except[ \t]*:")
+
+# Maps every byte that cannot be part of an identifier to a space, so whole-word
+# keyword matches become plain substring counts. Bytes >= 128 belong to UTF-8
+# encoded identifier characters and are kept.
+_WORD_BYTES = frozenset(b"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_") | frozenset(range(128, 256))
+_WORDS_ONLY = bytes(b if b in _WORD_BYTES else ord(" ") for b in range(256))
+
+class _Scan:
+    """Running totals over source fed in chunks that end on a line boundary"""
+
+    def __init__(self):
+        self.line_count = 0
+        self.functions = []
+        self.function_count = 0
+        self.decision_points = 0
+        self.long_lines = []
+        self.long_line_count = 0
+        self.has_tabs = False
+        self.has_todo = False
+        self.has_bare_except = False
+
+    def feed(self, chunk: bytes):
+        words = b" " + chunk.translate(_WORDS_ONLY) + b" "
+        self.decision_points += sum(words.count(b" " + keyword + b" ") for keyword in DECISION_KEYWORDS)
+        del words
+
+        names = _FUNCTION.findall(chunk)
+        self.function_count += len(names)
+        room = MAX_LISTED_FUNCTIONS - len(self.functions)
+        self.functions.extend(name.decode("utf-8", "replace") for name in names[:room])
+        del names
+        self.has_tabs = self.has_tabs or b"\t" in chunk
+        self.has_todo = self.has_todo or b"TODO" in chunk or b"FIXME" in chunk
+        self.has_bare_except = self.has_bare_except or _BARE_EXCEPT.search(chunk) is not None
+
+        lines = chunk.split(b"\n")
+        if lines[-1] == b"":
+            lines.pop()
+        lengths = list(map(len, lines))
+        if lengths and max(lengths) > LONG_LINE_LIMIT:
+            for index, length in enumerate(lengths):
+                # Byte length only over-estimates; confirm in characters
+                if length > LONG_LINE_LIMIT and len(lines[index].decode("utf-8", "replace")) > LONG_LINE_LIMIT:
+                    self.long_line_count += 1
+                    if len(self.long_lines) < 3:
+                        self.long_lines.append(self.line_count + index + 1)
+        self.line_count += len(lines)
+
+    def result(self, checksum: str) -> Dict[str, Any]:
+        return {
+            "checksum": checksum,
+            "line_count": self.line_count,
+            "functions": self.functions,
+            "function_count": self.function_count,
+            "decision_points": self.decision_points,
+            "long_lines": self.long_lines,
+            "long_line_count": self.long_line_count,
+            "has_tabs": self.has_tabs,
+            "has_todo": self.has_todo,
+            "has_bare_except": self.has_bare_except
+        }
+
+def code_checksum(code: str) -> str:
+    return f"{len(code)}:{zlib.crc32(code.encode()):08x}"
+
+def file_checksum(path: str) -> str:
+    stat = os.stat(path)
+    return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+def source_fingerprint(state: Dict[str, Any]) -> Optional[str]:
+    """Size and mtime of the file a code_path names, so cached results follow edits to it.
+
+    Uploads are content-addressed and inline code is part of the cache key, so
+    only code_path needs this.
+    """
+    if state.get("upload_id") or not state.get("code_path"):
+        return None
+    try:
+        return file_checksum(upload_store.resolve_code_path(state["code_path"]))
+    except OSError:
+        return None
+
+def analyze_code(code: str) -> Dict[str, Any]:
+    """Collect everything the review tools need from the source, once.
+
+    Every fact comes from a C-speed scan (bytes.translate/count, split, compiled
+    regexes), which on large files is far cheaper than a Python-level token
+    loop. The result is plain JSON so it can be kept in workflow state and read
+    by tools running in other processes.
+    """
+    encoded = code.encode()
+    scan = _Scan()
+    scan.feed(encoded)
+    return scan.result(f"{len(code)}:{zlib.crc32(encoded):08x}")
+
+def analyze_file(path: str) -> Dict[str, Any]:
+    """Analyze a file through mmap, a few megabytes of lines at a time.
+
+    Memory stays flat in the file size; only a single line longer than the
+    chunk size forces a larger chunk.
+    """
+    scan = _Scan()
+    checksum = file_checksum(path)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return scan.result(checksum)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            start = 0
+            released = 0
+            while start < size:
+                end = size
+                if start + CHUNK_SIZE < size:
+                    newline = mapped.rfind(b"\n", start, start + CHUNK_SIZE)
+                    if newline == -1:
+                        newline = mapped.find(b"\n", start + CHUNK_SIZE)
+                    if newline != -1:
+                        end = newline + 1
+                scan.feed(mapped[start:end])
+                start = end
+                # Drop pages already scanned so resident memory does not grow with the file
+                page_end = start - start % mmap.PAGESIZE
+                if _MADV_DONTNEED is not None and page_end > released:
+                    mapped.madvise(_MADV_DONTNEED, released, page_end - released)
+                    released = page_end
+    return scan.result(checksum)
+
+def source_path(state: Dict[str, Any]) -> Optional[str]:
+    """File holding the code to review, when the state refers to one instead of inlining it"""
+    if state.get("upload_id"):
+        return upload_store.path(state["upload_id"])
+    if state.get("code_path"):
+        return upload_store.resolve_code_path(state["code_path"])
+    return None
+
+def get_analysis(state: Dict[str, Any]) -> Dict[str, Any]:
+    """The analysis of the state's code, reusing the one an earlier tool stored if it still matches.
+
+    The code is state["code"], or the file named by state["upload_id"] or
+    state["code_path"], which is read through mmap rather than loaded.
+    """
+    path = source_path(state)
+    analysis = state.get("analysis")
+    if isinstance(analysis, dict):
+        if path is None and "code" not in state:
+            # No source to compare against, e.g. a per-file repository review
+            return analysis
+        checksum = file_checksum(path) if path else code_checksum(state["code"])
+        if analysis.get("checksum") == checksum:
+            return analysis
+    return analyze_file(path) if path else analyze_code(state.get("code", ""))
@@ -1,6 +1,8 @@
+from functools import partial
 from app.core.registry import tool_registry
 # Use relative imports
-from .tools import extract_functions, check_complexity, detect_issues, suggest_improvements
+from .tools import extract_functions, check_complexity, detect_issues, suggest_improvements, apply_each
+from .analysis import ANALYSIS_VERSION, SOURCE_KEYS, source_fingerprint
 from ..core.registry import tool_registry
 from ..models.schemas import GraphDefinition, NodeConfig, EdgeConfig, NodeType
 
@@ -8,10 +10,17 @@ from app.models.schemas import GraphDefinition, NodeConfig, EdgeConfig, NodeType
 
 def register_code_review_tools():
     """Register all code review tools"""
-    tool_registry.register("extract_functions", extract_functions)
-    tool_registry.register("check_complexity", check_complexity)
-    tool_registry.register("detect_issues", detect_issues)
-    tool_registry.register("suggest_improvements", suggest_improvements)
+    tool_registry.register("extract_functions", extract_functions, executor="process",
+                           batch_func=partial(apply_each, extract_functions), reads=SOURCE_KEYS,
+                           fingerprint=source_fingerprint, version=ANALYSIS_VERSION)
+    tool_registry.register("check_complexity", check_complexity, executor="thread",
+                           batch_func=partial(apply_each, check_complexity), reads=SOURCE_KEYS,
+                           fingerprint=source_fingerprint, version=ANALYSIS_VERSION)
+    tool_registry.register("detect_issues", detect_issues, executor="thread",
+                           batch_func=partial(apply_each, detect_issues), reads=SOURCE_KEYS,
+                           fingerprint=source_fingerprint, version=ANALYSIS_VERSION)
+    tool_registry.register("suggest_improvements", suggest_improvements,
+                           reads=["complexity_score", "issues", "function_count"])
 
 def get_code_review_workflow() -> GraphDefinition:
     """Get the code review workflow definition"""
@@ -21,6 +30,7 @@ def get_code_review_workflow() -> GraphDefinition:
             NodeConfig(name="extract", type=NodeType.STANDARD, tool="extract_functions"),
             NodeConfig(name="complexity", type=NodeType.STANDARD, tool="check_complexity"),
             NodeConfig(name="issues", type=NodeType.STANDARD, tool="detect_issues"),
+            NodeConfig(name="analysis_done", type=NodeType.JOIN),
             NodeConfig(
                 name="improve",
                 type=NodeType.LOOP,
@@ -30,9 +40,11 @@ def get_code_review_workflow() -> GraphDefinition:
             )
         ],
         edges=[
-            EdgeConfig(from_node="extract", to_node="complexity"),
-            EdgeConfig(from_node="complexity", to_node="issues"),
-            EdgeConfig(from_node="issues", to_node="improve"),
+            EdgeConfig(from_node="extract", to_node="complexity", parallel=True),
+            EdgeConfig(from_node="extract", to_node="issues", parallel=True),
+            EdgeConfig(from_node="complexity", to_node="analysis_done"),
+            EdgeConfig(from_node="issues", to_node="analysis_done"),
+            EdgeConfig(from_node="analysis_done", to_node="improve"),
         ],
         start_node="extract"
     )
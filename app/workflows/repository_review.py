@@ -0,0 +1,134 @@
+from fnmatch import fnmatch
+from typing import Any, Dict, List
+import asyncio
+import logging
+import os
+from app.core.events import event_bus, current_execution_id
+from app.core.executors import ToolExecutor, get_pool
+from app.core.registry import tool_registry
+from app.core.uploads import resolve_within, upload_store
+from app.models.schemas import GraphDefinition, NodeConfig, NodeType
+from .analysis import analyze_file
+from .tools import check_complexity, detect_issues, suggest_improvements
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INCLUDE = ["*.py"]
+SKIPPED_DIRS = {"__pycache__", "node_modules", "venv"}
+
+def review_file(path: str, code_roots: List[str]) -> Dict[str, Any]:
+    """Run the per-file review pipeline on one file; runs in a worker process.
+
+    The path is resolved again here, so a file swapped for a symlink after
+    find_files listed it still cannot be read from outside code_roots.
+    """
+    analysis = analyze_file(resolve_within(path, code_roots))
+    state: Dict[str, Any] = {"analysis": analysis, "function_count": analysis["function_count"]}
+    for tool in (check_complexity, detect_issues, suggest_improvements):
+        state.update(tool(state))
+
+    return {
+        "path": path,
+        "line_count": analysis["line_count"],
+        "function_count": analysis["function_count"],
+        "complexity_score": state["complexity_score"],
+        "issues": state["issues"],
+        "quality_score": state["quality_score"]
+    }
+
+def find_files(root: str, include: List[str], code_roots: List[str]) -> List[str]:
+    """Files under root matching any include pattern, skipping hidden and generated directories.
+
+    Symlinks that resolve outside code_roots are skipped.
+    """
+    files = []
+    for directory, subdirs, names in os.walk(root):
+        subdirs[:] = sorted(d for d in subdirs if not d.startswith(".") and d not in SKIPPED_DIRS)
+        for name in sorted(names):
+            if not any(fnmatch(name, pattern) for pattern in include):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                resolve_within(path, code_roots)
+            except PermissionError:
+                logger.warning(f"Skipping {path}: it links outside the configured CODE_ROOTS")
+                continue
+            files.append(path)
+    return files
+
+async def review_repository(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Review every matching file under state["repo_path"] across the process pool.
+
+    Each file's result is streamed to WebSocket subscribers as soon as it
+    finishes; the returned state carries per-file results and line-weighted
+    aggregate scores.
+    """
+    root = upload_store.resolve_code_path(state["repo_path"])
+    if not os.path.isdir(root):
+        raise ValueError(f"Repository path '{state['repo_path']}' is not a directory")
+
+    code_roots = upload_store.code_roots
+    paths = await asyncio.to_thread(find_files, root, state.get("include") or DEFAULT_INCLUDE, code_roots)
+    execution_id = current_execution_id.get()
+    loop = asyncio.get_running_loop()
+    pool = get_pool(ToolExecutor.PROCESS)
+
+    async def review(path: str) -> Dict[str, Any]:
+        try:
+            result = await loop.run_in_executor(pool, review_file, path, code_roots)
+        except Exception as e:
+            logger.error(f"Review of {path} failed: {e}")
+            result = {"path": path, "error": str(e)}
+        result["path"] = os.path.relpath(path, root)
+        return result
+
+    results = []
+    for finished in asyncio.as_completed([review(path) for path in paths]):
+        result = await finished
+        results.append(result)
+        if execution_id and event_bus.has_subscribers(execution_id):
+            event_bus.publish(execution_id, {
+                "execution_id": execution_id,
+                "status": "running",
+                "file_result": result,
+                "files_done": len(results),
+                "files_total": len(paths)
+            })
+
+    results.sort(key=lambda result: result["path"])
+    return {"file_results": results, **summarize(results)}
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregate per-file results, weighting quality by file length"""
+    reviewed = [result for result in results if "error" not in result]
+    total_lines = sum(result["line_count"] for result in reviewed)
+    weighted = sum(result["quality_score"] * max(result["line_count"], 1) for result in reviewed)
+    weights = sum(max(result["line_count"], 1) for result in reviewed)
+
+    return {
+        "files_reviewed": len(reviewed),
+        "files_failed": len(results) - len(reviewed),
+        "line_count": total_lines,
+        "function_count": sum(result["function_count"] for result in reviewed),
+        "issue_count": sum(len(result["issues"]) for result in reviewed),
+        "quality_score": round(weighted / weights, 1) if weights else 100,
+        "min_quality_score": min((result["quality_score"] for result in reviewed), default=100),
+        "lowest_quality_files": [
+            result["path"] for result in sorted(reviewed, key=lambda result: result["quality_score"])[:10]
+        ]
+    }
+
+def register_repository_review_tools():
+    """Register the repository review tool"""
+    tool_registry.register("review_repository", review_repository)
+
+def get_repository_review_workflow() -> GraphDefinition:
+    """Get the repository review workflow definition"""
+    return GraphDefinition(
+        name="Repository Review Agent",
+        nodes=[
+            NodeConfig(name="review_files", type=NodeType.STANDARD, tool="review_repository")
+        ],
+        edges=[],
+        start_node="review_files"
+    )
@@ -1,12 +1,21 @@
+from functools import partial
 from app.core.registry import tool_registry
-from .tools import extract_functions, check_complexity, detect_issues, suggest_improvements
+from .tools import extract_functions, check_complexity, detect_issues, suggest_improvements, apply_each
+from .analysis import ANALYSIS_VERSION, SOURCE_KEYS, source_fingerprint
 from app.models.schemas import GraphDefinition, NodeConfig, EdgeConfig, NodeType
 
 def register_workflow_tools():
-    tool_registry.register("extract_functions", extract_functions)
-    tool_registry.register("check_complexity", check_complexity)
-    tool_registry.register("detect_issues", detect_issues)
-    tool_registry.register("suggest_improvements", suggest_improvements)
+    tool_registry.register("extract_functions", extract_functions, executor="process",
+                           batch_func=partial(apply_each, extract_functions), reads=SOURCE_KEYS,
+                           fingerprint=source_fingerprint, version=ANALYSIS_VERSION)
+    tool_registry.register("check_complexity", check_complexity, executor="thread",
+                           batch_func=partial(apply_each, check_complexity), reads=SOURCE_KEYS,
+                           fingerprint=source_fingerprint, version=ANALYSIS_VERSION)
+    tool_registry.register("detect_issues", detect_issues, executor="thread",
+                           batch_func=partial(apply_each, detect_issues), reads=SOURCE_KEYS,
+                           fingerprint=source_fingerprint, version=ANALYSIS_VERSION)
+    tool_registry.register("suggest_improvements", suggest_improvements,
+                           reads=["complexity_score", "issues", "function_count"])
 
 # Register immediately when imported
 register_workflow_tools()
@@ -1,24 +1,17 @@
-import re
-from typing import Dict, Any
+from typing import Callable, Dict, Any, List
+from .analysis import get_analysis
 
 def extract_functions(state: Dict[str, Any]) -> Dict[str, Any]:
-    code = state.get("code", "")
-    function_pattern = r'def\\s+(\\w+)\\s*\\([^)]*\\):'
-    functions = re.findall(function_pattern, code)
+    analysis = get_analysis(state)
     
     return {
-        "functions": functions,
-        "function_count": len(functions)
+        "functions": analysis["functions"],
+        "function_count": analysis["function_count"],
+        "analysis": analysis
     }
 
 def check_complexity(state: Dict[str, Any]) -> Dict[str, Any]:
-    code = state.get("code", "")
-    decision_keywords = ['if', 'elif', 'for', 'while', 'and', 'or', 'except']
-    complexity = 1
-    
-    for keyword in decision_keywords:
-        complexity += code.count(f' {keyword} ')
-        complexity += code.count(f' {keyword}(')
+    complexity = 1 + get_analysis(state)["decision_points"]
     
     return {
         "complexity_score": complexity,
@@ -26,21 +19,19 @@ def check_complexity(state: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 def detect_issues(state: Dict[str, Any]) -> Dict[str, Any]:
-    code = state.get("code", "")
+    analysis = get_analysis(state)
     issues = []
     
-    if "TODO" in code or "FIXME" in code:
+    if analysis["has_todo"]:
         issues.append("Contains TODO/FIXME comments")
     
-    if code.count("\\t") > 0:
+    if analysis["has_tabs"]:
         issues.append("Uses tabs instead of spaces")
     
-    lines = code.split('\\n')
-    long_lines = [i for i, line in enumerate(lines, 1) if len(line) > 100]
-    if long_lines:
-        issues.append(f"Lines exceed 100 characters: {long_lines[:3]}")
+    if analysis["long_lines"]:
+        issues.append(f"Lines exceed 100 characters: {analysis['long_lines']}")
     
-    if "except:" in code:
+    if analysis["has_bare_except"]:
         issues.append("Uses bare except clause")
     
     return {
@@ -69,4 +60,8 @@ def suggest_improvements(state: Dict[str, Any]) -> Dict[str, Any]:
     return {
         "suggestions": suggestions,
         "quality_score": max(quality_score, 0)
-    }
\ No newline at end of file
+    }
+
+def apply_each(tool: Callable, states: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Batch form of a per-state tool, so a whole batch crosses the process pool in one call"""
+    return [tool(state) for state in states]
\ No newline at end of file
@@ -3,6 +3,9 @@ import websockets
 import json
 import httpx
 
+# Statuses after which the server sends nothing more
+FINISHED_STATUSES = ("completed", "failed", "timed_out", "cancelled")
+
 async def monitor_execution(execution_id: str):
     uri = f"ws://localhost:8000/api/v1/ws/execution/{execution_id}"
     
@@ -10,18 +13,26 @@ async def monitor_execution(execution_id: str):
     
     async with websockets.connect(uri) as websocket:
         print("✓ Connected! Monitoring execution...\n")
+        log_count = 0
         
         while True:
             try:
                 message = await websocket.recv()
                 data = json.loads(message)
+                if 'error' in data and 'status' not in data:
+                    print(f"✗ {data['error']}")
+                    break
+                
+                # The first message is a full snapshot, later ones are deltas
+                log_count += len(data.get('logs', []))
+                changed = data.get('current_state', data.get('state_delta', {}))
                 
                 print(f"Status: {data['status']}")
-                print(f"State keys: {list(data.get('current_state', {}).keys())}")
-                print(f"Log entries: {data.get('log_count', 0)}")
+                print(f"State keys: {list(changed.keys())}")
+                print(f"Log entries: {log_count}")
                 print("-" * 40)
                 
-                if data['status'] in ['completed', 'failed']:
+                if data['status'] in FINISHED_STATUSES:
                     print(f"\n✓ Execution {data['status']}")
                     break
                     
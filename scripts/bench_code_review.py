@@ -0,0 +1,94 @@
+"""Benchmark the code review tools on large inputs, with and without the shared analysis.
+
+The "separate scans" variant is the previous implementation, where every tool
+rescanned the code (with its escaping bugs fixed so it does the same work).
+
+Usage: python scripts/bench_code_review.py [--size-mb N] [--repeat R]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.workflows.tools import extract_functions, check_complexity, detect_issues
+
+UNIT = '''def process(items, limit=10):
+    """Process items. TODO: batch"""
+    total = 0
+    for item in items:
+        if item > limit and item % 2 == 0 or item < 0:
+            total += item  # accumulate the running total for the current items
+        elif item == limit:
+            try:
+                total -= 1
+            except:
+                pass
+    while total > 100:
+        total //= 2
+    return total
+
+'''
+
+def separate_extract(state):
+    functions = re.findall(r'def\s+(\w+)\s*\([^)]*\):', state.get("code", ""))
+    return {"functions": functions, "function_count": len(functions)}
+
+def separate_complexity(state):
+    code = state.get("code", "")
+    complexity = 1
+    for keyword in ['if', 'elif', 'for', 'while', 'and', 'or', 'except']:
+        complexity += code.count(f' {keyword} ')
+        complexity += code.count(f' {keyword}(')
+    return {"complexity_score": complexity}
+
+def separate_issues(state):
+    code = state.get("code", "")
+    issues = []
+    if "TODO" in code or "FIXME" in code:
+        issues.append("Contains TODO/FIXME comments")
+    if code.count("\t") > 0:
+        issues.append("Uses tabs instead of spaces")
+    long_lines = [i for i, line in enumerate(code.split('\n'), 1) if len(line) > 100]
+    if long_lines:
+        issues.append(f"Lines exceed 100 characters: {long_lines[:3]}")
+    if "except:" in code:
+        issues.append("Uses bare except clause")
+    return {"issues": issues, "issue_count": len(issues)}
+
+def run(label: str, tools, code: str, repeat: int) -> float:
+    best = float("inf")
+    per_tool = []
+    for _ in range(repeat):
+        state = {"code": code}
+        timings = []
+        for tool in tools:
+            start = time.perf_counter()
+            state.update(tool(state))
+            timings.append(time.perf_counter() - start)
+        if sum(timings) < best:
+            best, per_tool = sum(timings), timings
+
+    breakdown = ", ".join(f"{tool.__name__} {t * 1000:.0f}" for tool, t in zip(tools, per_tool))
+    print(f"{label:<18} {best * 1000:>8.1f} ms  ({breakdown} ms)")
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=float, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    code = UNIT * int(args.size_mb * 1024 * 1024 // len(UNIT))
+    print(f"input: {len(code) / 1024 / 1024:.1f} MB, {code.count(chr(10))} lines")
+
+    before = run("separate scans", [separate_extract, separate_complexity, separate_issues],
+                 code, args.repeat)
+    after = run("shared analysis", [extract_functions, check_complexity, detect_issues],
+                code, args.repeat)
+    print(f"speedup: {before / after:.1f}x")
+
+if __name__ == "__main__":
+    main()
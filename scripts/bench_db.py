@@ -0,0 +1,53 @@
+"""Benchmark executions persisted per second with and without group commit.
+
+Usage: python scripts/bench_db.py [--executions N] [--concurrency C]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import Database
+
+STATE = {"code": "def f(x):\n    return x\n" * 50, "quality_score": 84, "issues": []}
+LOG = [{"node": "extract", "status": "success", "state_delta": {"function_count": 1}}] * 5
+
+async def run(label: str, executions: int, concurrency: int, **options) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"), **options)
+        await db.connect()
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def save():
+            async with semaphore:
+                await db.save_execution(str(uuid.uuid4()), "bench", "completed", STATE, LOG)
+        
+        start = time.perf_counter()
+        await asyncio.gather(*(save() for _ in range(executions)))
+        elapsed = time.perf_counter() - start
+        commits = db.commits
+        await db.disconnect()
+    
+    rate = executions / elapsed
+    print(f"{label:<28} {rate:>10.0f} executions/s  ({commits} commits, {elapsed:.2f}s)")
+    return rate
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--executions", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+    
+    before = await run("commit per save", args.executions, args.concurrency,
+                       read_pool_size=0, max_batch_size=1)
+    after = await run("group commit", args.executions, args.concurrency,
+                      read_pool_size=4, max_batch_size=256)
+    print(f"speedup: {after / before:.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
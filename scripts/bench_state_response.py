@@ -0,0 +1,119 @@
+"""Benchmark GET /graph/state latency on execution states of several MB.
+
+Compares the previous response path (ExecutionStateResponse validation,
+jsonable_encoder, json.dumps) with FastJSONResponse on the standard library
+and on orjson, a fields=status projection, and gzip on the wire.
+
+Usage: python scripts/bench_state_response.py [--size-mb N] [--repeat R]
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+
+from app.api import responses
+from app.core.execution_store import execution_store
+from app.main import app
+from app.models.schemas import ExecutionStateResponse
+
+FUNCTION = "def handler_{i}(request):\n    payload = request.json()\n    return {{'id': {i}, 'ok': True}}\n\n"
+
+def make_record(size_mb: float) -> dict:
+    code = ""
+    i = 0
+    while len(code) < size_mb * 1024 * 1024 / 2:
+        code += FUNCTION.format(i=i)
+        i += 1
+    issues = [{"line": n, "severity": "warning", "message": f"handler_{n} lacks a docstring"}
+              for n in range(i)]
+    state = {"code": code, "functions": [f"handler_{n}" for n in range(i)],
+             "issues": issues, "quality_score": 72}
+    log = [{"node": "extract", "status": "success", "state_delta": {"code": code[:len(code) // 4]}}
+           for _ in range(4)]
+    return {"graph_id": "bench", "status": "completed", "state": state, "log": log}
+
+def payload(execution_id: str, record: dict) -> dict:
+    return {
+        "execution_id": execution_id,
+        "graph_id": record["graph_id"],
+        "status": record["status"],
+        "current_state": record["state"],
+        "execution_log": record["log"],
+        "first_step": 0,
+        "step_count": len(record["log"]),
+        "queue_position": None,
+        "queue_depth": 0,
+        "queue_wait_ms": None
+    }
+
+def timed(label: str, repeat: int, fn) -> float:
+    body = fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+    print(f"{label:<36} {elapsed:>9.2f} ms  {len(body) / 1024:>9.0f} KB")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=float, default=4)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    execution_id = "bench-state"
+    record = make_record(args.size_mb)
+    data = payload(execution_id, record)
+    orjson = responses.orjson
+
+    print("serialization only")
+
+    def previous():
+        model = ExecutionStateResponse(**data)
+        return json.dumps(jsonable_encoder(model), ensure_ascii=False,
+                          allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    baseline = timed("pydantic + jsonable_encoder + json", args.repeat, previous)
+    responses.orjson = None
+    timed("FastJSONResponse (json)", args.repeat, lambda: responses.dumps(data))
+    responses.orjson = orjson
+    if orjson is not None:
+        timed("FastJSONResponse (orjson)", args.repeat, lambda: responses.dumps(data))
+    else:
+        print("FastJSONResponse (orjson)            skipped, orjson is not installed")
+    timed("fields=status", args.repeat,
+          lambda: responses.dumps(responses.project(data, responses.parse_fields("status", data))))
+    encoded = responses.dumps(data)
+    timed("gzip level 5 of the full body", args.repeat, lambda: gzip.compress(encoded, 5))
+
+    print("end to end (TestClient)")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    execution_store.put(execution_id, record)
+    client = TestClient(app)
+    url = f"/api/v1/graph/state/{execution_id}"
+    for label, params, headers in [
+        ("full state", {}, {"Accept-Encoding": "identity"}),
+        ("full state, gzip", {}, {"Accept-Encoding": "gzip"}),
+        ("fields=status", {"fields": "status"}, {"Accept-Encoding": "identity"}),
+        ("fields=current_state.quality_score", {"fields": "current_state.quality_score"},
+         {"Accept-Encoding": "identity"}),
+    ]:
+        def request():
+            response = client.get(url, params=params, headers=headers)
+            response.raise_for_status()
+            return response.content
+
+        wire = int(client.get(url, params=params, headers=headers).headers.get("content-length", 0))
+        elapsed = timed(label, args.repeat, request)
+        print(f"{'':<36} {baseline / elapsed:>9.1f}x vs previous serialization, {wire / 1024:.0f} KB on the wire")
+
+if __name__ == "__main__":
+    main()
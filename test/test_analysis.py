@@ -0,0 +1,77 @@
+import os
+import pytest
+from app.core.uploads import UploadStore, UploadTooLargeError
+from app.workflows.analysis import analyze_code, analyze_file, get_analysis
+from app.workflows.tools import extract_functions, check_complexity, detect_issues
+
+SOURCE = """def first(a, b):
+    if a and b:
+        return a
+    for item in b:
+        verify(item)  # TODO handle errors
+    return b
+
+async def second(x) -> int:
+\ttry:
+        return modify(x) or x
+    except:
+        pass
+""" + "# " + "x" * 120 + "\n"
+
+def test_analysis_finds_functions_and_whole_word_keywords():
+    analysis = analyze_code(SOURCE)
+    
+    assert analysis["functions"] == ["first", "second"]
+    # if, and, for, or, except; not the "if" inside "verify" or "modify"
+    assert analysis["decision_points"] == 5
+    assert analysis["long_lines"] == [13]
+    assert analysis["has_tabs"] and analysis["has_todo"] and analysis["has_bare_except"]
+
+def test_tools_share_one_analysis():
+    state = {"code": SOURCE}
+    state.update(extract_functions(state))
+    assert state["function_count"] == 2
+    assert get_analysis(state) is state["analysis"]
+    
+    assert check_complexity(state)["complexity_score"] == 6
+    assert detect_issues(state)["issue_count"] == 4
+    
+    # A stale analysis is ignored once the code changes
+    state["code"] = "def only(): pass"
+    assert check_complexity(state)["complexity_score"] == 1
+
+def test_file_analysis_matches_inline_code_across_chunks(tmp_path, monkeypatch):
+    """Reading a file in small mmap chunks gives the same facts as the inline string"""
+    monkeypatch.setattr("app.workflows.analysis.CHUNK_SIZE", 64)
+    path = tmp_path / "big.py"
+    path.write_text(SOURCE * 20)
+    
+    from_file = analyze_file(str(path))
+    inline = analyze_code(SOURCE * 20)
+    
+    assert {k: v for k, v in from_file.items() if k != "checksum"} == \
+        {k: v for k, v in inline.items() if k != "checksum"}
+    assert from_file["function_count"] == 40
+    assert from_file["long_lines"] == [13, 26, 39]
+
+@pytest.mark.asyncio
+async def test_uploads_and_code_roots(tmp_path):
+    store = UploadStore(str(tmp_path / "uploads"), max_bytes=1024, code_roots=[str(tmp_path / "src")])
+    
+    async def body(*chunks):
+        for chunk in chunks:
+            yield chunk
+    
+    upload_id, size = await store.save(body(b"def a():\n", b"    pass\n"))
+    assert size == 18
+    with open(store.path(upload_id), "rb") as f:
+        assert f.read() == b"def a():\n    pass\n"
+    
+    with pytest.raises(UploadTooLargeError):
+        await store.save(body(b"x" * 1025))
+    assert os.listdir(tmp_path / "uploads") == [upload_id]
+    
+    (tmp_path / "src").mkdir()
+    assert store.resolve_code_path(str(tmp_path / "src" / "a.py")).endswith("a.py")
+    with pytest.raises(PermissionError):
+        store.resolve_code_path(str(tmp_path / "src" / ".." / "secret.py"))
@@ -0,0 +1,116 @@
+import pytest
+from app.core import blobs as blobs_module
+from app.core.blobs import BlobStore, blob_store, is_blob_ref
+from app.core.engine import WorkflowEngine
+from app.core.registry import tool_registry
+from app.database import Database
+from app.models.schemas import GraphDefinition, NodeConfig, EdgeConfig, NodeType
+
+CODE = "def f(x):\n    return x\n" * 100
+
+async def connect(tmp_path, monkeypatch) -> Database:
+    db = Database(str(tmp_path / "test.db"))
+    await db.connect()
+    monkeypatch.setattr(blobs_module, "db", db)
+    return db
+
+async def count_blobs(db: Database) -> int:
+    cursor = await db.connection.execute("SELECT count(*) FROM blobs")
+    return (await cursor.fetchone())[0]
+
+@pytest.mark.asyncio
+async def test_large_values_are_stored_once_and_resolved(tmp_path, monkeypatch):
+    blob_db = await connect(tmp_path, monkeypatch)
+    store = BlobStore(min_size=1024, max_bytes=len(CODE))
+    state = {"code": CODE, "name": "small"}
+    
+    first = await store.externalize(state)
+    second = await store.externalize({"code": CODE[:-1] + CODE[-1]})
+    assert is_blob_ref(first["code"]) and first["code"] == second["code"]
+    assert first["name"] == "small" and state["code"] is CODE
+    assert await count_blobs(blob_db) == 1
+    
+    assert await store.resolve(first, ["name"]) is first
+    assert (await store.resolve(first))["code"] is CODE
+    assert store.stats()["hits"] == 1
+    
+    # Evicted by a second value, then read back from the database
+    other = await store.externalize({"code": CODE.upper()})
+    assert await count_blobs(blob_db) == 2
+    assert await BlobStore().get(first["code"]["$blob"]) == CODE
+    assert (await store.resolve(first))["code"] == CODE
+    assert store.stats()["misses"] == 1
+    
+    with pytest.raises(ValueError):
+        await store.get("0" * 64)
+    
+    assert await BlobStore(min_size=0).externalize(state) is state
+    await blob_db.disconnect()
+    assert await store.externalize(other) is other
+
+@pytest.mark.asyncio
+async def test_engine_keeps_references_and_tools_see_values(tmp_path, monkeypatch):
+    blob_db = await connect(tmp_path, monkeypatch)
+    monkeypatch.setattr(blob_store, "min_size", 1024)
+    blob_store.clear()
+    seen = []
+    
+    def count_lines(state):
+        seen.append(state["code"])
+        return {"line_count": state["code"].count("\n"), "report": state["code"].upper()}
+    
+    tool_registry.register("blob_count_lines", count_lines, executor="thread")
+    engine = WorkflowEngine(GraphDefinition(
+        name="Blob Test",
+        nodes=[NodeConfig(name="count", type=NodeType.STANDARD, tool="blob_count_lines")],
+        edges=[],
+        start_node="count"
+    ))
+    
+    for _ in range(3):
+        initial_state = await blob_store.externalize({"code": CODE})
+        state, log = await engine.execute(initial_state)
+        assert is_blob_ref(state.get("code")) and is_blob_ref(state.get("report"))
+        assert state.get("line_count") == 200
+        assert is_blob_ref(log[0]["state_snapshot"]["report"])
+    
+    assert seen == [CODE] * 3 and seen[0] is seen[2]
+    assert await count_blobs(blob_db) == 2
+    assert (await blob_store.resolve(state.data))["report"] == CODE.upper()
+    blob_store.clear()
+    await blob_db.disconnect()
+
+@pytest.mark.asyncio
+async def test_map_results_stay_inline_and_conditions_see_values(tmp_path, monkeypatch):
+    blob_db = await connect(tmp_path, monkeypatch)
+    monkeypatch.setattr(blob_store, "min_size", 1024)
+    blob_store.clear()
+    
+    tool_registry.register("blob_expand", lambda state: {"text": state["item"] * 2000})
+    tool_registry.register("blob_lengths", lambda state: {
+        "lengths": [len(result["text"]) for result in state["expanded"]]
+    })
+    tool_registry.register("blob_flag", lambda state: {"flagged": True})
+    engine = WorkflowEngine(GraphDefinition(
+        name="Blob Map Test",
+        nodes=[
+            NodeConfig(name="expand", type=NodeType.MAP, tool="blob_expand",
+                       map_over="words", map_output="expanded"),
+            NodeConfig(name="lengths", type=NodeType.STANDARD, tool="blob_lengths"),
+            NodeConfig(name="flag", type=NodeType.STANDARD, tool="blob_flag"),
+        ],
+        edges=[
+            EdgeConfig(from_node="expand", to_node="lengths"),
+            EdgeConfig(from_node="lengths", to_node="flag", condition="'TODO' in code"),
+        ],
+        start_node="expand"
+    ))
+    
+    initial_state = await blob_store.externalize({"words": ["ab", "c"], "code": CODE + "# TODO\n"})
+    assert is_blob_ref(initial_state["code"])
+    state, _ = await engine.execute(initial_state)
+    
+    assert state.get("lengths") == [4000, 2000]
+    assert state.get("flagged") is True
+    blob_store.clear()
+    await blob_db.disconnect()
@@ -0,0 +1,100 @@
+import pytest
+from app.core.compiler import GraphCompileError, compile_graph
+from app.core.engine import WorkflowEngine
+from app.core.registry import tool_registry
+from app.models.schemas import GraphDefinition, NodeConfig, EdgeConfig, NodeType
+
+@pytest.fixture
+def compiler_tools():
+    tool_registry.register("compiler_add", lambda state: {"value": state.get("value", 0) + 1})
+
+def test_rejects_dangling_edges_unknown_tools_and_bad_conditions(compiler_tools):
+    definition = GraphDefinition(
+        name="Broken",
+        nodes=[
+            NodeConfig(name="a", tool="compiler_add"),
+            NodeConfig(name="b", tool="not_registered"),
+        ],
+        edges=[
+            EdgeConfig(from_node="a", to_node="missing"),
+            EdgeConfig(from_node="a", to_node="b", condition="__import__('os')"),
+        ],
+        start_node="a"
+    )
+    
+    with pytest.raises(GraphCompileError) as exc_info:
+        compile_graph(definition)
+    
+    errors = exc_info.value.errors
+    assert len(errors) == 3
+    assert "unknown tool 'not_registered'" in errors[0]
+    assert "unknown node 'missing'" in errors[1]
+    assert "Invalid condition" in errors[2]
+
+def test_prunes_unreachable_nodes_and_precomputes_successors(compiler_tools):
+    definition = GraphDefinition(
+        name="Prune",
+        nodes=[
+            NodeConfig(name="a", tool="compiler_add"),
+            NodeConfig(name="b", tool="compiler_add"),
+            NodeConfig(name="c", tool="compiler_add"),
+            NodeConfig(name="orphan", tool="compiler_add"),
+        ],
+        edges=[
+            EdgeConfig(from_node="a", to_node="b", condition="value > 5"),
+            EdgeConfig(from_node="a", to_node="c"),
+            EdgeConfig(from_node="orphan", to_node="a"),
+        ],
+        start_node="a"
+    )
+    
+    plan = compile_graph(definition)
+    
+    assert plan.pruned == ["orphan"] and "orphan" not in plan.nodes
+    assert plan.successors["a"].next_node({"value": 9}) == "b"
+    assert plan.successors["a"].next_node({"value": 1}) == "c"
+    assert plan.successors["c"].next_node({}) is None
+    assert not plan.cycle_guarded
+
+@pytest.mark.asyncio
+async def test_flags_cycles_through_non_loop_nodes(compiler_tools):
+    engine = WorkflowEngine(GraphDefinition(
+        name="Cycle",
+        nodes=[
+            NodeConfig(name="start", tool="compiler_add"),
+            NodeConfig(name="a", tool="compiler_add"),
+            NodeConfig(name="b", tool="compiler_add"),
+            NodeConfig(name="spin", type=NodeType.LOOP, tool="compiler_add",
+                       loop_condition="value < 3", max_iterations=5),
+        ],
+        edges=[
+            EdgeConfig(from_node="start", to_node="a"),
+            EdgeConfig(from_node="a", to_node="b"),
+            EdgeConfig(from_node="b", to_node="a"),
+            EdgeConfig(from_node="spin", to_node="spin"),
+        ],
+        start_node="start"
+    ))
+    
+    assert engine.cycle_guarded == {"a", "b"}
+    assert any("form a cycle" in warning for warning in engine.warnings)
+    assert any("'spin' is unreachable" in warning for warning in engine.warnings)
+    
+    _, log = await engine.execute({"value": 0})
+    assert [entry["node"] for entry in log] == ["start", "a", "b"]
+
+@pytest.mark.asyncio
+async def test_guards_a_cycle_through_the_start_node_alone(compiler_tools):
+    engine = WorkflowEngine(GraphDefinition(
+        name="Self Loop",
+        nodes=[NodeConfig(name="a", tool="compiler_add")],
+        edges=[EdgeConfig(from_node="a", to_node="a")],
+        start_node="a"
+    ))
+    
+    assert engine.cycle_guarded == {"a"}
+    assert any("form a cycle" in warning for warning in engine.warnings)
+    
+    state, log = await engine.execute({"value": 0})
+    assert [entry["node"] for entry in log] == ["a"]
+    assert state.get("value") == 1
@@ -0,0 +1,123 @@
+import pytest
+import asyncio
+from app.database import Database
+
+@pytest.mark.asyncio
+async def test_concurrent_saves_share_commits(tmp_path):
+    """Saves queued while a commit is in flight are committed together"""
+    db = Database(str(tmp_path / "test.db"), read_pool_size=2)
+    await db.connect()
+    
+    await asyncio.gather(*(
+        db.save_execution(f"run-{i}", "graph", "completed", {"i": i}, []) for i in range(50)
+    ))
+    
+    assert db.writes == 50
+    assert db.commits < 50
+    execution = await db.get_execution("run-7")
+    assert execution["state"] == {"i": 7}
+    
+    mode = await (await db.connection.execute("PRAGMA journal_mode")).fetchone()
+    assert mode[0] == "wal"
+    await db.disconnect()
+
+@pytest.mark.asyncio
+async def test_disconnect_flushes_pending_writes(tmp_path):
+    """Queued writes are committed before the database closes"""
+    path = str(tmp_path / "test.db")
+    db = Database(path)
+    await db.connect()
+    save = asyncio.create_task(db.save_graph("g1", "Graph", {"name": "Graph"}))
+    await asyncio.sleep(0)
+    await db.disconnect()
+    await save
+    
+    db = Database(path)
+    await db.connect()
+    assert await db.get_graph("g1") == {"name": "Graph"}
+    await db.disconnect()
+
+@pytest.mark.asyncio
+async def test_list_executions_pages_by_keyset(tmp_path):
+    """Listing filters by graph and status and walks pages without gaps or repeats"""
+    db = Database(str(tmp_path / "test.db"))
+    await db.connect()
+    await db.save_executions([
+        (f"run-{i}", f"graph-{i % 2}", "failed" if i % 3 == 0 else "completed", {"i": i}, [], None)
+        for i in range(25)
+    ])
+    
+    seen = []
+    after = None
+    while True:
+        page, after = await db.list_executions(graph_id="graph-0", after=after, limit=4)
+        seen.extend(page)
+        if after is None:
+            break
+    
+    assert sorted(row["execution_id"] for row in seen) == sorted(f"run-{i}" for i in range(0, 25, 2))
+    assert "current_state" not in seen[0] and "state" not in seen[0]
+    # Same created_at second: newest insert (highest rowid) first
+    assert seen[0]["execution_id"] == "run-24"
+    
+    failed, after = await db.list_executions(graph_id="graph-0", status="failed")
+    assert [row["execution_id"] for row in failed] == ["run-24", "run-18", "run-12", "run-6", "run-0"]
+    assert after is None
+    await db.disconnect()
+
+@pytest.mark.asyncio
+async def test_checkpoints_append_steps_and_read_slices(tmp_path):
+    """Checkpoints store only new log entries; legacy log blobs still read back in order"""
+    db = Database(str(tmp_path / "test.db"))
+    await db.connect()
+    log = []
+    for step in range(5):
+        log.append({"node": f"n{step}"})
+        _, appended = await db.checkpoint_execution("run", "graph", "running", {"step": step}, log, step)
+        assert appended == len('{"node": "n0"}')
+    
+    execution = await db.get_execution("run")
+    assert [entry["node"] for entry in execution["log"]] == ["n0", "n1", "n2", "n3", "n4"]
+    assert [entry["node"] for entry in await db.get_steps("run", 1, 2)] == ["n1", "n2"]
+    latest = await db.get_execution("run", include_log=False)
+    assert latest["state"] == {"step": 4} and latest["step_count"] == 5 and "log" not in latest
+    
+    # A row written before the step table: its first entries live in execution_log
+    await db.connection.execute(
+        "INSERT INTO executions (id, graph_id, status, current_state, execution_log) VALUES (?, ?, ?, ?, ?)",
+        ("legacy", "graph", "failed", "{}", '[{"node": "a"}, {"node": "b"}]')
+    )
+    await db.connection.commit()
+    await db.checkpoint_execution("legacy", "graph", "completed", {}, [{"node": "a"}, {"node": "b"}, {"node": "c"}], 2)
+    
+    assert [entry["node"] for entry in (await db.get_execution("legacy"))["log"]] == ["a", "b", "c"]
+    assert [entry["node"] for entry in await db.get_steps("legacy", 1)] == ["b", "c"]
+    assert (await db.get_execution("legacy", include_log=False))["step_count"] == 3
+    await db.disconnect()
+
+@pytest.mark.asyncio
+async def test_failing_write_does_not_commit_or_fail_its_batch(tmp_path):
+    """A write that fails is rolled back alone; other writes in its batch commit"""
+    db = Database(str(tmp_path / "test.db"))
+    await db.connect()
+    
+    duplicate = db._write_many(
+        "INSERT INTO graphs (id, name, definition) VALUES (?, ?, ?)",
+        [("dup", "Dup", "{}"), ("dup", "Dup", "{}")]
+    )
+    results = await asyncio.gather(
+        db.save_graph("g1", "Graph", {"name": "Graph"}),
+        duplicate,
+        db.save_execution("run-1", "g1", "completed", {"i": 1}, []),
+        return_exceptions=True
+    )
+    
+    assert not isinstance(results[0], Exception) and not isinstance(results[2], Exception)
+    assert isinstance(results[1], Exception)
+    assert await db.get_graph("g1") == {"name": "Graph"}
+    assert await db.get_graph("dup") is None
+    assert (await db.get_execution("run-1"))["state"] == {"i": 1}
+    
+    await db.save_graph("g2", "Graph", {"name": "Graph"})
+    assert await db.get_graph("g2") == {"name": "Graph"}
+    await db.disconnect()
@@ -1,7 +1,7 @@
 import pytest
 import asyncio
-from app.core.engine import WorkflowEngine
-from app.core.state import WorkflowState
+from app.core.engine import WorkflowEngine, ExecutionDeadlineError
+from app.core.state import WorkflowState, reconstruct_state, merge_log_deltas
 from app.core.registry import tool_registry
 from app.models.schemas import GraphDefinition, NodeConfig, EdgeConfig, NodeType
 
@@ -94,4 +94,381 @@ async def test_loop_node(setup_tools):
     final_state, log = await engine.execute({"counter": 0})
     
     assert final_state.data["counter"] == 5
-    assert final_state.metadata["iteration_count"] >= 5
\ No newline at end of file
+    assert final_state.metadata["iteration_count"] >= 5
+
+def test_invalid_condition_rejected_at_build(setup_tools):
+    """Conditions are validated when the graph is built, not when first evaluated"""
+    graph_def = GraphDefinition(
+        name="Bad Condition",
+        nodes=[
+            NodeConfig(name="add", type=NodeType.STANDARD, tool="add_ten"),
+            NodeConfig(name="multiply", type=NodeType.STANDARD, tool="multiply_by_two"),
+        ],
+        edges=[
+            EdgeConfig(from_node="add", to_node="multiply", condition="__import__('os')"),
+        ],
+        start_node="add"
+    )
+    
+    with pytest.raises(ValueError):
+        WorkflowEngine(graph_def)
+
+def test_compiled_condition_reads_state_directly():
+    """Compiled conditions evaluate against the state mapping and fail closed"""
+    from app.core.condition import compile_condition
+    
+    condition = compile_condition("quality_score < 80 and not done")
+    assert condition is compile_condition("quality_score < 80 and not done")
+    assert condition.names == {"quality_score", "done"}
+    assert condition({"quality_score": 50, "done": False}) is True
+    assert condition({"quality_score": 90, "done": False}) is False
+    assert condition({}) is False
+
+def test_conditions_may_call_public_methods_of_state_values():
+    """Method calls such as str.startswith work as under the previous eval; other calls do not"""
+    from app.core.condition import compile_condition
+    
+    condition = compile_condition("code.startswith('def') and 'x' in tags.keys()")
+    assert condition({"code": "def f(): pass", "tags": {"x": 1}}) is True
+    assert condition({"code": "class A: pass", "tags": {"x": 1}}) is False
+    for source in ("len(code) > 3", "code.__class__()", "'{0.__class__}'.format(code)"):
+        with pytest.raises(ValueError):
+            compile_condition(source)
+
+def test_engine_cache_lru_and_counters(setup_tools):
+    """Compiled engines are reused by graph_id and evicted least-recently-used first"""
+    from app.core.engine_cache import EngineCache
+    
+    graph_def = GraphDefinition(
+        name="Cached",
+        nodes=[NodeConfig(name="add", type=NodeType.STANDARD, tool="add_ten")],
+        edges=[],
+        start_node="add"
+    )
+    cache = EngineCache(max_size=2)
+    engines = {graph_id: WorkflowEngine(graph_def) for graph_id in ("a", "b", "c")}
+    
+    cache.put("a", engines["a"])
+    cache.put("b", engines["b"])
+    assert cache.get("a") is engines["a"]
+    cache.put("c", engines["c"])
+    
+    assert cache.get("b") is None
+    assert cache.get("c") is engines["c"]
+    cache.invalidate("c")
+    assert cache.get("c") is None
+    
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+    assert stats["evictions"] == 1
+
+@pytest.mark.asyncio
+async def test_parallel_fan_out_and_join(setup_tools):
+    """Parallel branches run concurrently and merge with per-key strategies"""
+    async def score_a(state):
+        await asyncio.sleep(0.01)
+        return {"score": 1, "notes": ["a"], "winner": "a"}
+    
+    async def score_b(state):
+        return {"score": 2, "notes": ["b"], "winner": "b"}
+    
+    tool_registry.register("score_a", score_a)
+    tool_registry.register("score_b", score_b)
+    
+    graph_def = GraphDefinition(
+        name="Fan Out Test",
+        nodes=[
+            NodeConfig(name="add", type=NodeType.STANDARD, tool="add_ten"),
+            NodeConfig(name="a", type=NodeType.STANDARD, tool="score_a"),
+            NodeConfig(name="b", type=NodeType.STANDARD, tool="score_b"),
+            NodeConfig(name="join", type=NodeType.JOIN),
+            NodeConfig(name="multiply", type=NodeType.STANDARD, tool="multiply_by_two"),
+        ],
+        edges=[
+            EdgeConfig(from_node="add", to_node="a", parallel=True),
+            EdgeConfig(from_node="add", to_node="b", parallel=True),
+            EdgeConfig(from_node="a", to_node="join"),
+            EdgeConfig(from_node="b", to_node="join"),
+            EdgeConfig(from_node="join", to_node="multiply"),
+        ],
+        start_node="add",
+        merge_strategies={"score": "sum", "notes": "append"}
+    )
+    
+    engine = WorkflowEngine(graph_def)
+    final_state, log = await engine.execute({"value": 0, "score": 10})
+    
+    assert final_state.data["value"] == 20
+    assert final_state.data["score"] == 13
+    assert final_state.data["notes"] == ["a", "b"]
+    assert final_state.data["winner"] == "b"
+    assert [entry["node"] for entry in log] == ["add", "a", "b", "join", "multiply"]
+    assert log[1]["branch"] == "a"
+    assert reconstruct_state(log, 2)["winner"] == "b"
+    assert reconstruct_state(log, 3)["score"] == 13
+
+def slow_double(state):
+    import threading
+    return {"value": state.get("value", 0) * 2, "thread": threading.current_thread().name}
+
+@pytest.mark.asyncio
+async def test_sync_tools_run_in_pools():
+    """Tools registered with a pool executor run off the event loop"""
+    tool_registry.register("double_thread", slow_double, executor="thread")
+    tool_registry.register("double_process", slow_double, executor="process")
+    
+    graph_def = GraphDefinition(
+        name="Executor Test",
+        nodes=[
+            NodeConfig(name="threaded", type=NodeType.STANDARD, tool="double_thread"),
+            NodeConfig(name="process", type=NodeType.STANDARD, tool="double_process"),
+        ],
+        edges=[EdgeConfig(from_node="threaded", to_node="process")],
+        start_node="threaded"
+    )
+    
+    engine = WorkflowEngine(graph_def)
+    final_state, log = await engine.execute({"value": 3})
+    
+    assert final_state.data["value"] == 12
+    assert log[0]["state_snapshot"]["thread"].startswith("tool")
+    assert final_state.data["thread"] == "MainThread"
+    
+    with pytest.raises(ValueError):
+        tool_registry.register("lambda_process", lambda state: state, executor="process")
+
+@pytest.mark.asyncio
+async def test_delta_log_reconstructs_every_step(setup_tools, monkeypatch):
+    """Log entries hold only changed keys, with periodic full checkpoints"""
+    from app.config import settings
+    
+    monkeypatch.setattr(settings, "LOG_CHECKPOINT_INTERVAL", 2)
+    graph_def = GraphDefinition(
+        name="Delta Test",
+        nodes=[
+            NodeConfig(name="add", type=NodeType.STANDARD, tool="add_ten"),
+            NodeConfig(name="check", type=NodeType.STANDARD, tool="check_threshold"),
+            NodeConfig(name="multiply", type=NodeType.STANDARD, tool="multiply_by_two"),
+        ],
+        edges=[
+            EdgeConfig(from_node="add", to_node="check"),
+            EdgeConfig(from_node="check", to_node="multiply"),
+        ],
+        start_node="add"
+    )
+    
+    engine = WorkflowEngine(graph_def)
+    final_state, log = await engine.execute({"value": 45, "code": "x" * 1000})
+    
+    assert "state_snapshot" in log[0] and "state_snapshot" in log[2]
+    assert log[1]["state_delta"] == {"passed": True}
+    assert reconstruct_state(log, 1) == {"value": 55, "code": "x" * 1000, "passed": True}
+    assert reconstruct_state(log, 2) == final_state.data
+    with pytest.raises(IndexError):
+        reconstruct_state(log, 3)
+
+@pytest.mark.asyncio
+async def test_resume_from_checkpoint(setup_tools):
+    """A run resumed from a step checkpoint finishes with the same state"""
+    graph_def = GraphDefinition(
+        name="Resume Test",
+        nodes=[
+            NodeConfig(name="add", type=NodeType.STANDARD, tool="add_ten"),
+            NodeConfig(name="multiply", type=NodeType.STANDARD, tool="multiply_by_two"),
+            NodeConfig(name="add_again", type=NodeType.STANDARD, tool="add_ten"),
+        ],
+        edges=[
+            EdgeConfig(from_node="add", to_node="multiply"),
+            EdgeConfig(from_node="multiply", to_node="add_again"),
+        ],
+        start_node="add"
+    )
+    engine = WorkflowEngine(graph_def)
+    checkpoints = []
+    
+    async def on_step(state, log, next_node):
+        checkpoints.append((dict(state.data), list(log), next_node))
+    
+    final_state, log = await engine.execute({"value": 5}, on_step=on_step)
+    assert [checkpoint[2] for checkpoint in checkpoints] == ["multiply", "add_again", None]
+    
+    state, partial_log, next_node = checkpoints[0]
+    resumed_state, resumed_log = await engine.execute(
+        state, start_node=next_node, execution_log=partial_log
+    )
+    
+    assert resumed_state.data == final_state.data == {"value": 40}
+    assert [entry["node"] for entry in resumed_log] == ["add", "multiply", "add_again"]
+
+def add_ten_each(states):
+    add_ten_each.calls += 1
+    return [add_ten(state) for state in states]
+
+@pytest.mark.asyncio
+async def test_execute_batch_uses_vectorized_tools(setup_tools):
+    """Batch runs call a batch tool once per node and still branch per run"""
+    add_ten_each.calls = 0
+    tool_registry.register("add_ten_batched", add_ten, batch_func=add_ten_each)
+    graph_def = GraphDefinition(
+        name="Batch Test",
+        nodes=[
+            NodeConfig(name="add", type=NodeType.STANDARD, tool="add_ten_batched"),
+            NodeConfig(name="multiply", type=NodeType.STANDARD, tool="multiply_by_two"),
+            NodeConfig(
+                name="loop", type=NodeType.LOOP, tool="add_ten_batched",
+                loop_condition="value < 40", max_iterations=5
+            ),
+        ],
+        edges=[
+            EdgeConfig(from_node="add", to_node="multiply", condition="value > 12"),
+            EdgeConfig(from_node="add", to_node="loop"),
+        ],
+        start_node="add"
+    )
+    engine = WorkflowEngine(graph_def)
+    
+    results = await engine.execute_batch([{"value": 0}, {"value": 5}, {"value": 1}])
+    
+    assert [state.data["value"] for state, _ in results] == [40, 30, 41]
+    assert [[entry["node"] for entry in log] for _, log in results] == [
+        ["add", "loop"], ["add", "multiply"], ["add", "loop"]
+    ]
+    # One call for "add", then one per loop iteration over the runs still looping
+    assert add_ten_each.calls == 1 + 3
+    
+    single_state, _ = await engine.execute({"value": 5})
+    assert single_state.data == results[1][0].data
+
+@pytest.mark.asyncio
+async def test_node_timeout_and_graph_deadline(setup_tools):
+    """A slow node fails with a timeout error; a run past the graph deadline is cancelled"""
+    async def slow(state):
+        await asyncio.sleep(5)
+        return {"slow": True}
+    
+    tool_registry.register("slow", slow)
+    
+    engine = WorkflowEngine(GraphDefinition(
+        name="Timeout Test",
+        nodes=[
+            NodeConfig(name="slow", type=NodeType.STANDARD, tool="slow", timeout_seconds=0.05),
+            NodeConfig(name="add", type=NodeType.STANDARD, tool="add_ten"),
+        ],
+        edges=[EdgeConfig(from_node="slow", to_node="add")],
+        start_node="slow"
+    ))
+    state, log = await engine.execute({"value": 1})
+    assert log[0]["status"] == "error" and "timed out" in log[0]["error"]
+    assert state.get("value") == 11 and "slow" not in state.data
+    
+    engine = WorkflowEngine(GraphDefinition(
+        name="Deadline Test",
+        nodes=[
+            NodeConfig(name="add", type=NodeType.STANDARD, tool="add_ten"),
+            NodeConfig(name="slow", type=NodeType.STANDARD, tool="slow"),
+        ],
+        edges=[EdgeConfig(from_node="add", to_node="slow")],
+        start_node="add",
+        deadline_seconds=0.05
+    ))
+    with pytest.raises(ExecutionDeadlineError) as exc_info:
+        await engine.execute({"value": 1})
+    assert exc_info.value.state.get("value") == 11
+    assert [entry["node"] for entry in exc_info.value.execution_log] == ["add"]
+
+@pytest.mark.asyncio
+async def test_deadline_stops_a_walk_of_sync_tools(setup_tools):
+    """A cycle of inline sync tools still yields, so the graph deadline can stop it"""
+    engine = WorkflowEngine(GraphDefinition(
+        name="Sync Cycle",
+        nodes=[
+            NodeConfig(name="a", type=NodeType.LOOP, tool="add_ten",
+                       loop_condition="True", max_iterations=1),
+            NodeConfig(name="b", type=NodeType.LOOP, tool="add_ten",
+                       loop_condition="True", max_iterations=1),
+        ],
+        edges=[
+            EdgeConfig(from_node="a", to_node="b"),
+            EdgeConfig(from_node="b", to_node="a"),
+        ],
+        start_node="a",
+        deadline_seconds=0.2
+    ))
+    assert not engine.cycle_guarded
+    
+    with pytest.raises(ExecutionDeadlineError) as exc_info:
+        await asyncio.wait_for(engine.execute({"value": 0}), timeout=5)
+    assert exc_info.value.state.get("value") > 0
+
+@pytest.mark.asyncio
+async def test_map_node_runs_tool_per_item_with_concurrency_limit(setup_tools):
+    """A map node collects one result per element, in order, never exceeding its concurrency"""
+    running = 0
+    peak = 0
+    
+    async def square(state):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01 * (5 - state["item"] % 5))
+        running -= 1
+        if state["item"] < 0:
+            raise ValueError("negative item")
+        return {"square": state["item"] ** 2, "offset": state["value"]}
+    
+    tool_registry.register("square", square)
+    
+    engine = WorkflowEngine(GraphDefinition(
+        name="Map Test",
+        nodes=[
+            NodeConfig(name="squares", type=NodeType.MAP, tool="square",
+                       map_over="numbers", map_output="squares", map_concurrency=3),
+            NodeConfig(name="add", type=NodeType.STANDARD, tool="add_ten"),
+        ],
+        edges=[EdgeConfig(from_node="squares", to_node="add")],
+        start_node="squares"
+    ))
+    state, log = await engine.execute({"numbers": list(range(10)), "value": 1})
+    
+    assert [result["square"] for result in state.get("squares")] == [n * n for n in range(10)]
+    assert all(result["offset"] == 1 for result in state.get("squares"))
+    assert peak == 3
+    assert "item" not in state.data and state.get("value") == 11
+    assert log[0]["status"] == "success"
+    
+    state, log = await engine.execute({"numbers": [1, -1, 2], "value": 1})
+    assert log[0]["status"] == "error" and "negative item" in log[0]["error"]
+    assert "squares" not in state.data
+    
+    state, log = await engine.execute({"numbers": "not a list", "value": 1})
+    assert "needs a list in 'numbers'" in log[0]["error"]
+    
+    with pytest.raises(ValueError):
+        NodeConfig(name="bad", type=NodeType.MAP, tool="square")
+
+@pytest.mark.asyncio
+async def test_branches_without_join_are_logged_on_the_main_line(setup_tools):
+    """Keys merged from branches that never reach a join land in a main-line entry"""
+    tool_registry.register("set_a", lambda state: {"a": 1})
+    tool_registry.register("set_b", lambda state: {"b": 2})
+    
+    engine = WorkflowEngine(GraphDefinition(
+        name="Open Fan Out Test",
+        nodes=[
+            NodeConfig(name="add", type=NodeType.STANDARD, tool="add_ten"),
+            NodeConfig(name="a", type=NodeType.STANDARD, tool="set_a"),
+            NodeConfig(name="b", type=NodeType.STANDARD, tool="set_b"),
+        ],
+        edges=[
+            EdgeConfig(from_node="add", to_node="a", parallel=True),
+            EdgeConfig(from_node="add", to_node="b", parallel=True),
+        ],
+        start_node="add"
+    ))
+    
+    for state, log in [await engine.execute({"value": 1})] + await engine.execute_batch([{"value": 1}]):
+        assert state.data == {"value": 11, "a": 1, "b": 2}
+        assert log[-1]["merged_branches"] == ["a", "b"] and "branch" not in log[-1]
+        assert reconstruct_state(log, len(log) - 1) == state.data
+        assert merge_log_deltas(log) == state.data
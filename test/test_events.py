@@ -0,0 +1,35 @@
+import pytest
+import json
+from app.core.events import EventBus, RESYNC
+
+@pytest.mark.asyncio
+async def test_publish_shares_one_encoded_message():
+    """Every subscriber of an execution receives the same encoded event"""
+    bus = EventBus()
+    first = bus.subscribe("run-1")
+    second = bus.subscribe("run-1")
+    other = bus.subscribe("run-2")
+    
+    bus.publish("run-1", {"status": "running", "logs": [{"node": "a"}]}, first_step=0, step_count=1)
+    
+    event_a, event_b = first.get_nowait(), second.get_nowait()
+    assert event_a.message is event_b.message
+    assert json.loads(event_a.message)["logs"] == [{"node": "a"}]
+    assert event_a.step_count == 1
+    assert other.empty()
+    
+    bus.unsubscribe("run-1", first)
+    bus.unsubscribe("run-1", second)
+    assert not bus.has_subscribers("run-1")
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_asked_to_resync():
+    """A full subscriber queue is replaced by a single RESYNC marker"""
+    bus = EventBus(max_queue_size=2)
+    queue = bus.subscribe("run-1")
+    
+    for step in range(3):
+        bus.publish("run-1", {"step": step}, first_step=step, step_count=1)
+    
+    assert queue.get_nowait() is RESYNC
+    assert queue.empty()
@@ -0,0 +1,36 @@
+import time
+from app.core.execution_store import ExecutionStore
+
+def finished(n):
+    return {"status": "completed", "state": {"n": n}, "log": []}
+
+def test_store_evicts_lru_finished_runs_and_pins_active_ones():
+    """Finished runs are evicted least-recently-used first; running ones never are"""
+    store = ExecutionStore(max_entries=2, ttl_seconds=60, max_bytes=10_000)
+    store.put("running", {"status": "running", "state": {}, "log": []})
+    store.put("a", finished(1), size=10)
+    store.put("b", finished(2), size=10)
+    
+    assert store.get("running", touch=False) is not None
+    assert store.get("a", touch=False) is None
+    assert store.get("b")["state"] == {"n": 2}
+    assert store.stats()["evictions"] == 1
+
+def test_store_enforces_memory_ceiling():
+    """Records are dropped once their encoded size exceeds the ceiling"""
+    store = ExecutionStore(max_entries=100, ttl_seconds=60, max_bytes=100)
+    store.put("a", finished(1), size=60)
+    store.put("b", finished(2), size=60)
+    
+    assert store.get("a", touch=False) is None
+    assert store.get("b", touch=False) is not None
+    assert store.total_bytes == 60
+
+def test_store_expires_finished_runs():
+    """Finished runs expire after the TTL"""
+    store = ExecutionStore(max_entries=100, ttl_seconds=0.01, max_bytes=10_000)
+    store.put("a", finished(1), size=10)
+    time.sleep(0.02)
+    
+    assert store.get("a") is None
+    assert store.total_bytes == 0
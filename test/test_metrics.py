@@ -0,0 +1,43 @@
+import pytest
+from app.core import metrics
+from app.core.engine import WorkflowEngine
+from app.core.metrics import Counter, Histogram, MetricsRegistry
+from app.core.registry import tool_registry
+from app.models.schemas import GraphDefinition, NodeConfig, NodeType
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+    latency = registry.register(Histogram("latency_seconds", "Request latency", ["route"], buckets=(0.1, 1)))
+    errors = registry.register(Counter("errors_total", "Errors", ["kind"]))
+    
+    latency.observe(0.05, route="/a")
+    latency.observe(0.1, route="/a")
+    latency.observe(3, route="/a")
+    errors.inc(kind='say "hi"')
+    
+    lines = registry.render().splitlines()
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+    assert 'errors_total{kind="say \\"hi\\""} 1' in lines
+
+@pytest.mark.asyncio
+async def test_engine_records_durations_and_loop_iterations():
+    tool_registry.register("metrics_increment", lambda state: {"i": state.get("i", 0) + 1})
+    engine = WorkflowEngine(GraphDefinition(
+        name="Metrics Test",
+        nodes=[NodeConfig(name="metrics_loop", type=NodeType.LOOP, tool="metrics_increment",
+                          loop_condition="i < 4", max_iterations=10)],
+        edges=[],
+        start_node="metrics_loop"
+    ))
+    
+    _, log = await engine.execute({"i": 0})
+    
+    assert log[0]["duration_ms"] >= 0
+    rendered = metrics.registry.render()
+    assert 'workflow_node_duration_seconds_count{node="metrics_loop"} 1' in rendered
+    assert 'workflow_tool_duration_seconds_count{tool="metrics_increment"} 4' in rendered
+    assert 'workflow_loop_iterations_bucket{node="metrics_loop",le="5"} 1' in rendered
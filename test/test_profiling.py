@@ -0,0 +1,83 @@
+import asyncio
+import tracemalloc
+import pytest
+from app.core.engine import WorkflowEngine
+from app.core.profiling import ExecutionProfiler
+from app.core.registry import tool_registry
+from app.models.schemas import GraphDefinition, NodeConfig, NodeType
+
+def profiled_allocate(state):
+    return {"blocks": [bytearray(1024) for _ in range(200)]}
+
+def unprofiled_spin(state):
+    return {"total": sum(range(1000))}
+
+def engine_for(name: str, tool: str) -> WorkflowEngine:
+    return WorkflowEngine(GraphDefinition(
+        name=name,
+        nodes=[NodeConfig(name="first", type=NodeType.STANDARD, tool=tool),
+               NodeConfig(name="second", type=NodeType.STANDARD, tool=tool)],
+        edges=[{"from_node": "first", "to_node": "second"}],
+        start_node="first"
+    ))
+
+@pytest.mark.asyncio
+async def test_profiles_only_its_own_execution():
+    tool_registry.register("profiled_allocate", profiled_allocate)
+    tool_registry.register("unprofiled_spin", unprofiled_spin)
+    profiled = engine_for("Profiled", "profiled_allocate")
+    other = engine_for("Other", "unprofiled_spin")
+    profiler = ExecutionProfiler(top_n=200)
+    
+    (state, _), _ = await asyncio.gather(
+        profiler.run(profiled.execute({})),
+        other.execute({})
+    )
+    
+    report = profiler.report()
+    functions = " ".join(row["function"] for row in report["top_functions"])
+    assert "profiled_allocate" in functions
+    assert "unprofiled_spin" not in functions
+    assert len(state.get("blocks")) == 200
+    assert any("bytearray" in row["code"] for row in report["top_allocations"])
+    assert not tracemalloc.is_tracing()
+
+@pytest.mark.asyncio
+async def test_errors_propagate_and_profile_is_kept():
+    async def failing():
+        await asyncio.sleep(0)
+        raise ValueError("boom")
+    
+    profiler = ExecutionProfiler()
+    with pytest.raises(ValueError):
+        await profiler.run(failing())
+    
+    assert profiler.report()["wall_time_ms"] >= 0
+    assert not tracemalloc.is_tracing()
+
+@pytest.mark.asyncio
+async def test_overlapping_runs_keep_their_peak_and_leave_tracing_as_found():
+    freed = asyncio.Event()
+    finished = asyncio.Event()
+    
+    async def spike():
+        block = bytearray(4 * 1024 * 1024)
+        del block
+        freed.set()
+        await finished.wait()
+    
+    async def small():
+        await freed.wait()
+        finished.set()
+    
+    first, second = ExecutionProfiler(), ExecutionProfiler()
+    await asyncio.gather(first.run(spike()), second.run(small()))
+    assert first.peak_memory >= 4 * 1024 * 1024
+    assert not tracemalloc.is_tracing()
+    
+    tracemalloc.start()
+    try:
+        await ExecutionProfiler().run(small())
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,73 @@
+import json
+import os
+import pytest
+from app.core.engine import WorkflowEngine
+from app.core.events import event_bus, current_execution_id
+from app.core.uploads import upload_store
+from app.workflows.repository_review import (
+    register_repository_review_tools, get_repository_review_workflow, review_file
+)
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    root = tmp_path / "repo"
+    (root / "pkg").mkdir(parents=True)
+    (root / ".git").mkdir()
+    (root / "pkg" / "clean.py").write_text("def ok():\n    return 1\n")
+    (root / "pkg" / "messy.py").write_text(
+        "def bad(x):\n    if x and x or x:\n        pass  # TODO\n    try:\n        pass\n    except:\n        pass\n"
+    )
+    (root / ".git" / "hook.py").write_text("def hidden(): pass\n")
+    (root / "README.md").write_text("not python\n")
+    monkeypatch.setattr(upload_store, "code_roots", [str(tmp_path)])
+    register_repository_review_tools()
+    return root
+
+@pytest.mark.asyncio
+async def test_repository_review_aggregates_and_streams_files(repo):
+    """Every Python file is reviewed in the pool and streamed as it finishes"""
+    engine = WorkflowEngine(get_repository_review_workflow())
+    queue = event_bus.subscribe("repo-run")
+    token = current_execution_id.set("repo-run")
+    try:
+        state, log = await engine.execute({"repo_path": str(repo)})
+    finally:
+        current_execution_id.reset(token)
+        event_bus.unsubscribe("repo-run", queue)
+    
+    assert log[0]["status"] == "success"
+    data = state.data
+    assert [result["path"] for result in data["file_results"]] == ["pkg/clean.py", "pkg/messy.py"]
+    assert data["files_reviewed"] == 2
+    assert data["function_count"] == 2
+    assert data["lowest_quality_files"][0] == "pkg/messy.py"
+    assert data["min_quality_score"] < data["quality_score"] < 100
+    
+    streamed = [json.loads(queue.get_nowait().message) for _ in range(queue.qsize())]
+    assert sorted(event["file_result"]["path"] for event in streamed) == ["pkg/clean.py", "pkg/messy.py"]
+    assert streamed[-1]["files_done"] == streamed[-1]["files_total"] == 2
+
+@pytest.mark.asyncio
+async def test_repository_outside_code_roots_is_refused(repo, tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_store, "code_roots", [str(tmp_path / "elsewhere")])
+    engine = WorkflowEngine(get_repository_review_workflow())
+    
+    _, log = await engine.execute({"repo_path": str(repo)})
+    
+    assert log[0]["status"] == "error"
+    assert "CODE_ROOTS" in log[0]["error"]
+
+@pytest.mark.asyncio
+async def test_symlinks_outside_code_roots_are_not_read(repo, tmp_path, monkeypatch):
+    """A symlink inside the repository to a file outside CODE_ROOTS is skipped"""
+    secret = tmp_path / "secret.py"
+    secret.write_text("def secret():\n    return 'hunter2'\n")
+    (repo / "pkg" / "leak.py").symlink_to(secret)
+    monkeypatch.setattr(upload_store, "code_roots", [os.path.realpath(repo)])
+    engine = WorkflowEngine(get_repository_review_workflow())
+    
+    state, _ = await engine.execute({"repo_path": str(repo)})
+    
+    assert [result["path"] for result in state.get("file_results")] == ["pkg/clean.py", "pkg/messy.py"]
+    with pytest.raises(PermissionError):
+        review_file(str(repo / "pkg" / "leak.py"), [os.path.realpath(repo)])
@@ -0,0 +1,64 @@
+import json
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from app.api import responses
+from app.api.responses import parse_fields, project
+from app.core.execution_store import execution_store
+from app.main import app
+from app.models.schemas import ExecutionStateResponse
+
+PAYLOAD = {
+    "status": "completed",
+    "current_state": {"code": "x = 1\n" * 10, "quality_score": 84, "issues": []},
+    "execution_log": [{"node": "extract", "status": "success"}]
+}
+
+def test_parse_fields_and_project():
+    assert parse_fields(None, PAYLOAD) is None
+    assert project(PAYLOAD, None) is PAYLOAD
+    
+    selected = parse_fields("status, current_state.quality_score,current_state.missing", PAYLOAD)
+    assert project(PAYLOAD, selected) == {"status": "completed", "current_state": {"quality_score": 84}}
+    
+    # A whole field wins over keys selected inside it, in either order
+    for fields in ("current_state,current_state.quality_score", "current_state.quality_score,current_state"):
+        assert project(PAYLOAD, parse_fields(fields, PAYLOAD)) == {"current_state": PAYLOAD["current_state"]}
+    
+    with pytest.raises(HTTPException) as exc_info:
+        parse_fields("status,source", PAYLOAD)
+    assert exc_info.value.status_code == 400
+
+def test_dumps_without_orjson(monkeypatch):
+    monkeypatch.setattr(responses, "orjson", None)
+    assert json.loads(responses.dumps({"name": "café", "values": [1, 2.5, None]})) == {
+        "name": "café", "values": [1, 2.5, None]
+    }
+
+def test_dumps_falls_back_for_values_orjson_rejects():
+    assert json.loads(responses.dumps({"big": 2 ** 70})) == {"big": 2 ** 70}
+
+def test_state_endpoint_fields_and_gzip():
+    record = {"graph_id": "g", "status": "completed",
+              "state": PAYLOAD["current_state"], "log": PAYLOAD["execution_log"]}
+    execution_store.put("responses-test", record)
+    client = TestClient(app)
+    url = "/api/v1/graph/state/responses-test"
+    try:
+        response = client.get(url, headers={"Accept-Encoding": "identity"})
+        body = response.json()
+        assert ExecutionStateResponse(**body).current_state == PAYLOAD["current_state"]
+        assert body["step_count"] == 1
+        
+        response = client.get(url, params={"fields": "status,current_state.quality_score"})
+        assert response.json() == {"status": "completed", "current_state": {"quality_score": 84}}
+        
+        assert client.get(url, params={"fields": "nope"}).status_code == 400
+        
+        record["state"] = {"code": "def f():\n    return 1\n" * 500}
+        response = client.get(url, params={"fields": "current_state"}, headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert int(response.headers["content-length"]) < len(response.content)
+        assert response.json()["current_state"] == record["state"]
+    finally:
+        execution_store.pop("responses-test")
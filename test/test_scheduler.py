@@ -0,0 +1,250 @@
+import pytest
+import asyncio
+from app.core.scheduler import ExecutionScheduler, QueueFullError
+
+@pytest.mark.asyncio
+async def test_scheduler_bounds_concurrency_and_queue():
+    """At most max_workers jobs run at once and a full queue rejects new work"""
+    scheduler = ExecutionScheduler(max_workers=2, max_queue_size=3)
+    await scheduler.start()
+    
+    release = asyncio.Event()
+    running = []
+    peak = 0
+    
+    def make_job(name):
+        async def job():
+            nonlocal peak
+            running.append(name)
+            peak = max(peak, len(running))
+            await release.wait()
+            running.remove(name)
+        return job
+    
+    for i in range(2):
+        scheduler.submit(f"run-{i}", make_job(f"run-{i}"))
+    await asyncio.sleep(0)
+    
+    for i in range(2, 5):
+        scheduler.submit(f"run-{i}", make_job(f"run-{i}"))
+    assert scheduler.queue_depth() == 3
+    
+    with pytest.raises(QueueFullError) as exc_info:
+        scheduler.submit("overflow", make_job("overflow"))
+    assert exc_info.value.retry_after >= 1
+    
+    release.set()
+    await asyncio.wait_for(scheduler._queue.join(), timeout=1)
+    
+    assert peak == 2
+    assert scheduler.stats()["completed"] == 5
+    await scheduler.stop()
+
+@pytest.mark.asyncio
+async def test_scheduler_runs_higher_priority_first():
+    """Queued jobs are ordered by priority, then by submission order"""
+    scheduler = ExecutionScheduler(max_workers=1, max_queue_size=10)
+    await scheduler.start()
+    
+    order = []
+    gate = asyncio.Event()
+    
+    async def blocker():
+        await gate.wait()
+    
+    def make_job(name):
+        async def job():
+            order.append(name)
+        return job
+    
+    scheduler.submit("blocker", blocker)
+    await asyncio.sleep(0)
+    scheduler.submit("low", make_job("low"), priority=0)
+    scheduler.submit("high", make_job("high"), priority=5)
+    scheduler.submit("low-2", make_job("low-2"), priority=0)
+    
+    assert scheduler.queue_position("high") == 0
+    assert scheduler.queue_position("low-2") == 2
+    
+    gate.set()
+    await asyncio.wait_for(scheduler._queue.join(), timeout=1)
+    
+    assert order == ["high", "low", "low-2"]
+    await scheduler.stop()
+
+@pytest.mark.asyncio
+async def test_scheduler_cancels_queued_and_running_jobs():
+    """Cancelled jobs free their worker, which keeps serving the queue"""
+    scheduler = ExecutionScheduler(max_workers=1, max_queue_size=10)
+    await scheduler.start()
+    
+    order = []
+    
+    async def hang():
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            order.append("hang cancelled")
+            raise
+    
+    def make_job(name):
+        async def job():
+            order.append(name)
+        return job
+    
+    scheduler.submit("hang", hang)
+    await asyncio.sleep(0)
+    scheduler.submit("queued", make_job("queued"))
+    scheduler.submit("after", make_job("after"))
+    
+    assert await scheduler.cancel("queued") == "queued"
+    assert await scheduler.cancel("hang") == "running"
+    assert "hang" not in scheduler.running
+    assert await scheduler.cancel("unknown") is None
+    
+    await asyncio.wait_for(scheduler._queue.join(), timeout=1)
+    assert order == ["hang cancelled", "after"]
+    assert len(scheduler._workers) == 1 and not scheduler._workers[0].done()
+    await scheduler.stop()
+
+def test_batch_size_is_bounded():
+    """A batch occupies one scheduler slot, so it cannot hold more than MAX_BATCH_SIZE runs"""
+    from pydantic import ValidationError
+    from app.config import settings
+    from app.models.schemas import RunBatchRequest
+    
+    RunBatchRequest(graph_id="g", initial_states=[{}] * settings.MAX_BATCH_SIZE)
+    with pytest.raises(ValidationError):
+        RunBatchRequest(graph_id="g", initial_states=[{}] * (settings.MAX_BATCH_SIZE + 1))
+
+@pytest.mark.asyncio
+async def test_cancel_during_final_save_still_finishes_the_run(tmp_path, monkeypatch):
+    """A cancel landing while a finished run is being stored waits for its final status"""
+    from app.api import routes
+    from app.core.engine import WorkflowEngine
+    from app.core.execution_store import execution_store
+    from app.core.registry import tool_registry
+    from app.database import Database
+    from app.models.schemas import GraphDefinition, NodeConfig, NodeType
+    
+    db = Database(str(tmp_path / "test.db"))
+    await db.connect()
+    monkeypatch.setattr(routes, "db", db)
+    scheduler = ExecutionScheduler(max_workers=1, max_queue_size=10)
+    monkeypatch.setattr(routes, "scheduler", scheduler)
+    await scheduler.start()
+    
+    saving = asyncio.Event()
+    release = asyncio.Event()
+    checkpoint_execution = db.checkpoint_execution
+    
+    async def slow_final_save(execution_id, graph_id, status, *args):
+        if status != "running":
+            saving.set()
+            await release.wait()
+        return await checkpoint_execution(execution_id, graph_id, status, *args)
+    
+    monkeypatch.setattr(db, "checkpoint_execution", slow_final_save)
+    tool_registry.register("late_cancel_step", lambda state: {"done": True})
+    engine = WorkflowEngine(GraphDefinition(
+        name="Late Cancel",
+        nodes=[NodeConfig(name="step", type=NodeType.STANDARD, tool="late_cancel_step")],
+        edges=[],
+        start_node="step"
+    ))
+    
+    scheduler.submit("late", lambda: routes.execute_workflow_background("late", "g", engine, {}))
+    await asyncio.wait_for(saving.wait(), timeout=1)
+    cancel = asyncio.create_task(scheduler.cancel("late"))
+    await asyncio.sleep(0)
+    release.set()
+    assert await asyncio.wait_for(cancel, timeout=1) == "running"
+    
+    record = execution_store.get("late")
+    assert record["status"] == "completed"
+    assert "late" in execution_store._expires
+    assert (await db.get_execution("late"))["status"] == "completed"
+    execution_store.pop("late")
+    await scheduler.stop()
+    await db.disconnect()
+
+@pytest.mark.asyncio
+async def test_rows_left_active_without_a_job_can_be_cancelled_and_resumed(tmp_path, monkeypatch, caplog):
+    """A queued or running row nothing is running is not pinned as active"""
+    from fastapi import HTTPException
+    from app.api import routes
+    from app.core.execution_store import execution_store
+    from app.database import Database
+    
+    db = Database(str(tmp_path / "test.db"))
+    await db.connect()
+    monkeypatch.setattr(routes, "db", db)
+    scheduler = ExecutionScheduler(max_workers=1, max_queue_size=10)
+    monkeypatch.setattr(routes, "scheduler", scheduler)
+    await scheduler.start()
+    for execution_id in ("orphan-1", "orphan-2"):
+        await db.save_execution(execution_id, "deleted-graph", "running", {"value": 1}, [], "step")
+    
+    await routes.resume_interrupted_executions()
+    assert "orphan-1: Graph not found" in caplog.text
+    
+    await routes.cancel_execution("orphan-1")
+    assert (await db.get_execution("orphan-1"))["status"] == "cancelled"
+    
+    assert (await routes.load_execution("orphan-2"))["status"] == "running"
+    with pytest.raises(HTTPException) as exc_info:
+        await routes.resume_execution("orphan-2")
+    assert exc_info.value.status_code == 404
+    
+    execution_store.pop("orphan-1")
+    await scheduler.stop()
+    await db.disconnect()
+
+@pytest.mark.asyncio
+async def test_queued_row_is_saved_before_the_job_can_run(tmp_path, monkeypatch):
+    """A fast run's final status is not overwritten by its queued row; rejected runs leave no row"""
+    from fastapi import HTTPException
+    from app.api import routes
+    from app.core.engine_cache import engine_cache
+    from app.core.execution_store import execution_store
+    from app.core.registry import tool_registry
+    from app.database import Database
+    from app.models.schemas import RunGraphRequest
+    
+    db = Database(str(tmp_path / "test.db"))
+    await db.connect()
+    monkeypatch.setattr(routes, "db", db)
+    scheduler = ExecutionScheduler(max_workers=1, max_queue_size=1)
+    monkeypatch.setattr(routes, "scheduler", scheduler)
+    await scheduler.start()
+    tool_registry.register("fast_step", lambda state: {"done": True})
+    await db.save_graph("fast", "Fast", {
+        "name": "Fast", "nodes": [{"name": "step", "tool": "fast_step"}], "edges": [], "start_node": "step"
+    })
+    engine_cache.invalidate("fast")
+    saved = db.save_execution
+    
+    async def slow_save(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        return await saved(*args, **kwargs)
+    
+    monkeypatch.setattr(db, "save_execution", slow_save)
+    response = await routes.run_graph(RunGraphRequest(graph_id="fast", initial_state={}))
+    await asyncio.wait_for(scheduler._queue.join(), timeout=1)
+    assert (await db.get_execution(response.execution_id))["status"] == "completed"
+    
+    async def fill_queue_while_saving(*args, **kwargs):
+        result = await saved(*args, **kwargs)
+        monkeypatch.setattr(scheduler, "max_queue_size", 0)
+        return result
+    
+    monkeypatch.setattr(db, "save_execution", fill_queue_while_saving)
+    monkeypatch.setattr(scheduler, "max_queue_size", 1)
+    with pytest.raises(HTTPException) as exc_info:
+        await routes.run_graph(RunGraphRequest(graph_id="fast", initial_state={}))
+    assert exc_info.value.status_code == 429
+    assert await db.get_interrupted_executions() == []
+    
+    execution_store.pop(response.execution_id)
+    await scheduler.stop()
+    await db.disconnect()
@@ -0,0 +1,150 @@
+import pytest
+from app.core import tool_cache as tool_cache_module
+from app.core.engine import WorkflowEngine
+from app.core.registry import tool_registry
+from app.core.tool_cache import ToolResultCache
+from app.database import Database
+from app.models.schemas import GraphDefinition, NodeConfig, NodeType
+
+def count_words(state):
+    count_words.calls += 1
+    return {"words": state["text"].split(), "word_count": len(state["text"].split())}
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ToolResultCache(max_entries=8)
+    monkeypatch.setattr("app.core.node.tool_cache", cache)
+    count_words.calls = 0
+    tool_registry.register("count_words", count_words, reads=["text"])
+    return cache
+
+def word_graph():
+    return GraphDefinition(
+        name="Cache Test",
+        nodes=[NodeConfig(name="count", type=NodeType.STANDARD, tool="count_words")],
+        edges=[],
+        start_node="count"
+    )
+
+@pytest.mark.asyncio
+async def test_repeated_inputs_hit_the_cache(cache):
+    """A tool with declared reads runs once per distinct input and logs cache hits"""
+    engine = WorkflowEngine(word_graph())
+    
+    first, first_log = await engine.execute({"text": "a b c", "unrelated": 1})
+    second, second_log = await engine.execute({"text": "a b c", "unrelated": 2})
+    await engine.execute({"text": "a b"})
+    
+    assert count_words.calls == 2
+    assert first_log[0]["cache_hit"] is False
+    assert second_log[0]["cache_hit"] is True
+    assert second.data["word_count"] == 3
+    assert cache.stats()["hits"] == 1
+    
+    # Cached results are copies, so mutating one state cannot leak into the next
+    second.data["words"].append("d")
+    third, _ = await engine.execute({"text": "a b c"})
+    assert third.data["words"] == ["a", "b", "c"]
+
+@pytest.mark.asyncio
+async def test_tools_without_reads_are_not_cached(cache):
+    tool_registry.register("count_words_uncached", count_words)
+    engine = WorkflowEngine(GraphDefinition(
+        name="Uncached",
+        nodes=[NodeConfig(name="count", type=NodeType.STANDARD, tool="count_words_uncached")],
+        edges=[],
+        start_node="count"
+    ))
+    
+    _, log = await engine.execute({"text": "a"})
+    await engine.execute({"text": "a"})
+    
+    assert count_words.calls == 2
+    assert "cache_hit" not in log[0]
+
+@pytest.mark.asyncio
+async def test_results_that_change_in_json_are_not_cached(cache):
+    """A hit must return the same types as a fresh run, so tuples and int keys are not cached"""
+    await cache.put("tuple", {"pair": (1, 2)})
+    await cache.put("int_keys", {"counts": {1: "a"}})
+    await cache.put("plain", {"pair": [1, 2], "counts": {"1": "a"}})
+    
+    assert await cache.get("tuple") is None
+    assert await cache.get("int_keys") is None
+    assert await cache.get("plain") == {"pair": [1, 2], "counts": {"1": "a"}}
+
+@pytest.mark.asyncio
+async def test_persisted_tier_survives_a_new_cache(tmp_path, monkeypatch):
+    db = Database(str(tmp_path / "test.db"))
+    await db.connect()
+    monkeypatch.setattr(tool_cache_module, "db", db)
+    key = ToolResultCache.key("count_words", count_words, ["text"], {"text": "a"})
+    
+    await ToolResultCache(persist=True).put(key, {"word_count": 1})
+    restarted = ToolResultCache(persist=True)
+    
+    assert await restarted.get(key) == {"word_count": 1}
+    assert restarted.stats()["persisted_hits"] == 1
+    assert await restarted.get(key) == {"word_count": 1}
+    assert restarted.stats()["hits"] == 1
+    await db.disconnect()
+
+@pytest.mark.asyncio
+async def test_code_path_results_follow_file_edits(cache, tmp_path, monkeypatch):
+    """Tools reading a code_path are keyed on the file's size and mtime, not just the path"""
+    from app.core.uploads import upload_store
+    from app.workflows.analysis import SOURCE_KEYS, source_fingerprint
+    from app.workflows.tools import extract_functions
+    
+    monkeypatch.setattr(upload_store, "code_roots", [str(tmp_path)])
+    tool_registry.register("cached_extract", extract_functions, reads=SOURCE_KEYS,
+                           fingerprint=source_fingerprint)
+    engine = WorkflowEngine(GraphDefinition(
+        name="Path Cache Test",
+        nodes=[NodeConfig(name="extract", type=NodeType.STANDARD, tool="cached_extract")],
+        edges=[],
+        start_node="extract"
+    ))
+    source = tmp_path / "a.py"
+    source.write_text("def a():\n    pass\n")
+    
+    first, _ = await engine.execute({"code_path": str(source)})
+    again, log = await engine.execute({"code_path": str(source)})
+    assert again.data["functions"] == ["a"] and log[0]["cache_hit"] is True
+    
+    source.write_text("def a():\n    pass\n\ndef b():\n    pass\n")
+    edited, log = await engine.execute({"code_path": str(source)})
+    assert edited.data["functions"] == ["a", "b"] and log[0]["cache_hit"] is False
+
+def test_key_changes_with_tool_code_and_version():
+    def before(state):
+        return {"word_count": len(state["text"].split())}
+    
+    def after(state):
+        return {"word_count": len(state["text"].split()) + 0}
+    
+    after.__qualname__ = before.__qualname__
+    data = {"text": "a b"}
+    key = ToolResultCache.key("count", before, ["text"], data)
+    assert key == ToolResultCache.key("count", before, ["text"], data)
+    assert key != ToolResultCache.key("count", after, ["text"], data)
+    assert key != ToolResultCache.key("count", before, ["text"], data, version="2")
+
+@pytest.mark.asyncio
+async def test_persisted_tier_is_pruned(tmp_path, monkeypatch):
+    db = Database(str(tmp_path / "test.db"))
+    await db.connect()
+    monkeypatch.setattr(tool_cache_module, "db", db)
+    cache = ToolResultCache(persist=True, persist_max_entries=3, persist_ttl_seconds=3600)
+    for i in range(5):
+        await cache.put(f"key-{i}", {"i": i})
+    await db.connection.execute(
+        "UPDATE tool_results SET created_at = datetime('now', '-2 hours') WHERE key = 'key-4'"
+    )
+    await db.connection.commit()
+    
+    assert await ToolResultCache(persist=True, persist_ttl_seconds=3600).get("key-4") is None
+    await cache.prune()
+    cursor = await db.connection.execute("SELECT key FROM tool_results ORDER BY key")
+    assert [row[0] for row in await cursor.fetchall()] == ["key-2", "key-3"]
+    await db.disconnect()